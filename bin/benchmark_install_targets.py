@@ -0,0 +1,82 @@
+"""
+Compares ``make -n`` latency on a Makefile with many install targets (one per extra), with the install target name
+known at generation time, and computed at runtime from ``$@`` through a shell pipeline (as it was done before, three
+subprocesses per target).
+
+Usage::
+
+    $ python bin/benchmark_install_targets.py [--extras N] [--runs N]
+
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+from medikit.feature.make import Makefile
+
+LEGACY_TARGET_LINE = "\t$(eval target := $(shell echo $@ | rev | cut -d/ -f1 | rev))"
+
+
+def create_makefile(extras):
+    makefile = Makefile()
+    makefile["PIP"] = "pip"
+    for extra in (None, *extras):
+        target = makefile.add_install_target(extra)
+        target.install.append("$(PIP) install -r requirements{}.txt".format("-" + extra if extra else ""))
+        target.deps.append("setup.py")
+    return makefile
+
+
+def to_legacy(content):
+    """
+    Former rendering: the target name is computed when make runs, and used in the messages.
+
+    """
+    lines = []
+    for line in content.split("\n"):
+        if line.startswith(".medikit/") and ":" in line:
+            lines += [line, LEGACY_TARGET_LINE]
+        elif line.startswith("\t@printf ") and "\\033[36m%s" in line:
+            lines.append(line.rsplit(" ", 1)[0] + " $(target)")
+        else:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def measure(path, goals, runs):
+    durations = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        subprocess.run(["make", "-n", "-C", path, *goals], check=True, stdout=subprocess.DEVNULL)
+        durations.append(time.perf_counter() - started_at)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extras", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    options = parser.parse_args()
+
+    extras = ["extra{}".format(i) for i in range(options.extras)]
+    goals = ["install", *("install-" + extra for extra in extras)]
+    content = str(create_makefile(extras))
+
+    with tempfile.TemporaryDirectory() as path:
+        open(os.path.join(path, "setup.py"), "w").close()
+        for name, makefile in (("runtime ($(shell ...))", to_legacy(content)), ("generation time", content)):
+            with open(os.path.join(path, "Makefile"), "w") as f:
+                f.write(makefile)
+            duration = measure(path, goals, options.runs)
+            print(
+                "{:<24} {:>9.2f}ms (make -n, {} install targets, median of {} runs)".format(
+                    name, duration * 1000, len(goals), options.runs
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Builds a Makefile model with thousands of variables and targets, mimicking what a large (monorepo-like) project would
+generate, and reports the time spent in the model operations and in rendering (streamed, or through jinja as it was
+done before).
+
+Usage::
+
+    $ python bin/benchmark_makefile.py [--variables N] [--targets N]
+
+"""
+import argparse
+import io
+import time
+
+from medikit.feature import _create_jinja_environment
+from medikit.feature.make import Makefile
+from medikit.utils import format_file_content
+
+
+def timed(label, func, *args):
+    started_at = time.perf_counter()
+    result = func(*args)
+    print("{:<24} {:>9.2f}ms".format(label, (time.perf_counter() - started_at) * 1000))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variables", type=int, default=5000)
+    parser.add_argument("--targets", type=int, default=5000)
+    options = parser.parse_args()
+
+    makefile = Makefile()
+    variables = [("VAR_{}".format(i), "value-{}".format(i)) for i in range(options.variables)]
+
+    def set_variables():
+        for key, value in variables:
+            makefile[key] = value
+
+    def update_left():
+        makefile.updateleft(*variables[::2])
+
+    def delete_variables():
+        for key, value in variables[1::4]:
+            del makefile[key]
+
+    def add_targets():
+        for i in range(options.targets):
+            makefile.add_target("target-{}".format(i), "echo {}".format(i), deps=("install",), first=not i % 10)
+
+    timed("set variables", set_variables)
+    timed("updateleft", update_left)
+    timed("delete variables", delete_variables)
+    timed("add targets", add_targets)
+
+    def render_with_jinja():
+        return format_file_content(_create_jinja_environment().from_string(str(makefile)).render())
+
+    def render():
+        fp = io.StringIO()
+        makefile.render(fp)
+        return fp.getvalue()
+
+    expected = timed("render (jinja)", render_with_jinja)
+    assert timed("render (stream)", render) == expected
+
+
+if __name__ == "__main__":
+    main()
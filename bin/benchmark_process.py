@@ -0,0 +1,52 @@
+"""
+Measures the output throughput of the System pipeline step, on a command writing a large number of lines (output is
+discarded), compared to running the same command with its output sent to /dev/null directly.
+
+Usage::
+
+    $ python bin/benchmark_process.py [--lines N] [--runs N]
+
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import subprocess
+import time
+
+from medikit.steps.exec import System
+
+
+def run_step(command):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        System(command).run({})
+
+
+def run_direct(command):
+    subprocess.check_call(command, shell=True, stdout=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=5)
+    options = parser.parse_args()
+
+    command = "seq 1 {}".format(options.lines)
+    for name, func in (("direct", run_direct), ("System step", run_step)):
+        durations = []
+        for _ in range(options.runs):
+            started_at = time.perf_counter()
+            func(command)
+            durations.append(time.perf_counter() - started_at)
+        duration = statistics.median(durations)
+        print(
+            "{:<12} {:>9.2f}ms {:>12.0f} lines/s (median of {} runs)".format(
+                name, duration * 1000, options.lines / duration, options.runs
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
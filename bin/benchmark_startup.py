@@ -0,0 +1,93 @@
+"""
+Measures medikit command line startup cost, using python's ``-X importtime`` to account for module import time.
+
+Usage::
+
+    $ python bin/benchmark_startup.py [--runs N] [--max-import-time MS] [project_dir]
+
+The "update" and "pipeline" commands need a project, the given directory (or the current one) must contain a
+Projectfile. Commands are run against a temporary copy of the project, so that "update" does not change it.
+
+Exits with a non-zero status if the median import time of a command exceeds ``--max-import-time``.
+
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COMMANDS = {"help": ("--help",), "update": ("update",), "pipeline show": ("pipeline", "release", "show")}
+
+HEAVY_MODULES = ("jinja2", "pip", "piptools", "yapf", "git", "git_semver")
+
+
+def run(args, *, cwd):
+    started_at = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "medikit", *args],
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    duration = time.perf_counter() - started_at
+
+    import_time, imported = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        import_time += int(self_us)
+        imported.add(name.strip())
+
+    return duration, import_time / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("project_dir", nargs="?", default=os.getcwd())
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-time", type=float, default=None, help="Maximum median import time (ms).")
+    options = parser.parse_args()
+
+    project_dir = os.path.join(tempfile.mkdtemp(), "project")
+    shutil.copytree(
+        options.project_dir,
+        project_dir,
+        ignore=shutil.ignore_patterns(".git", ".medikit", "node_modules", "*.egg-info"),
+    )
+
+    # first update is not representative (git init, ...)
+    run(COMMANDS["update"], cwd=project_dir)
+
+    failed = False
+    print("{:<16} {:>10} {:>12}  {}".format("command", "wall (ms)", "import (ms)", "heavy modules imported"))
+    for name, args in COMMANDS.items():
+        durations, import_times, imported = [], [], set()
+        for _ in range(options.runs):
+            duration, import_time, imported = run(args, cwd=project_dir)
+            durations.append(duration * 1000)
+            import_times.append(import_time)
+
+        import_time = statistics.median(import_times)
+        print(
+            "{:<16} {:>10.1f} {:>12.1f}  {}".format(
+                name,
+                statistics.median(durations),
+                import_time,
+                ", ".join(sorted(m for m in HEAVY_MODULES if m in imported)) or "-",
+            )
+        )
+        if options.max_import_time is not None and import_time > options.max_import_time:
+            failed = True
+
+    shutil.rmtree(os.path.dirname(project_dir))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Compares template loading time with a cold (empty) and a warm jinja bytecode cache, as seen by a new medikit process.
+
+Usage::
+
+    $ python bin/benchmark_templates.py [--runs N]
+
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+from medikit.feature import _create_jinja_environment
+from medikit.feature.make import Makefile
+
+INLINE_TEMPLATES = (
+    "include *.txt",
+    "__version__ = '{{ version }}'",
+    """
+    *.egg-info
+    *.pyc
+    /.cache
+    /build
+    /dist
+    """,
+)
+
+
+def load_all(cache_dir):
+    started_at = time.perf_counter()
+    environment = _create_jinja_environment(cache_dir)
+    for name in environment.list_templates():
+        if name.endswith(".j2"):
+            environment.get_template(name)
+    for source in (*INLINE_TEMPLATES, str(Makefile())):
+        environment.get_template(environment.inline_loader.add(source))
+    return time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    options = parser.parse_args()
+
+    cold, warm = [], []
+    for _ in range(options.runs):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cold.append(load_all(cache_dir))
+            warm.append(load_all(cache_dir))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    print("cold: {:.2f}ms (median of {} runs)".format(statistics.median(cold) * 1000, options.runs))
+    print("warm: {:.2f}ms (median of {} runs)".format(statistics.median(warm) * 1000, options.runs))
+
+
+if __name__ == "__main__":
+    main()
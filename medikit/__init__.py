@@ -1,8 +1,5 @@
-# noinspection PyUnresolvedReferences
 from contextlib import contextmanager
 
-import piptools
-
 from medikit._version import __version__
 
 on_start = "medikit.on_start"
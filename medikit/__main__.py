@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import json
 import logging
 import os
 import sys
@@ -12,6 +13,63 @@ import medikit
 from medikit.commands.main import MedikitCommand
 
 
+def _get_git_version(path):
+    try:
+        return check_output(["git", "describe"], cwd=path).decode("utf-8").strip() + " (git)"
+    except:
+        return check_output(["git", "rev-parse", "HEAD"], cwd=path).decode("utf-8").strip()[0:7] + " (git)"
+
+
+def _get_git_state(git_dir):
+    """
+    Modification times of the files "git describe" output depends on (current ref, tags), used as a cache key.
+
+    """
+    paths = [os.path.join(git_dir, "HEAD"), os.path.join(git_dir, "packed-refs"), os.path.join(git_dir, "refs", "tags")]
+    with open(paths[0]) as f:
+        head = f.read().strip()
+    if head.startswith("ref:"):
+        paths.append(os.path.join(git_dir, *head[4:].strip().split("/")))
+    return [head, *(os.stat(path).st_mtime if os.path.exists(path) else None for path in paths)]
+
+
+def get_version():
+    """
+    Get medikit version, including git information if running from a git checkout. As running git on each
+    invocation is costly, the git version is cached in the git directory, until HEAD, the current ref or tags change.
+
+    """
+    path = os.path.dirname(os.path.dirname(medikit.__file__))
+    git_dir = os.path.join(path, ".git")
+    if not os.path.exists(git_dir):
+        return medikit.__version__
+
+    try:
+        if not os.path.isdir(git_dir):
+            return _get_git_version(path)
+
+        cache_file = os.path.join(git_dir, "medikit-version.json")
+        state = _get_git_state(git_dir)
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if cached["state"] == state:
+                return cached["version"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        version = _get_git_version(path)
+        try:
+            with open(cache_file, "w+") as f:
+                json.dump({"state": state, "version": version}, f)
+        except OSError:
+            pass  # read only checkout, no cache
+        return version
+    except:
+        warnings.warn("Git repository found, but could not find version number from the repository.")
+        return medikit.__version__
+
+
 def main(args=None):
     if not sys.warnoptions:
         logging.captureWarnings(True)
@@ -32,27 +90,8 @@ def main(args=None):
 
     config_filename = os.path.join(os.getcwd(), options.pop("target", "."), options.pop("config"))
 
-    version = medikit.__version__
-    try:
-        if os.path.exists(os.path.join(os.path.dirname(os.path.dirname(medikit.__file__)), ".git")):
-            try:
-                version = (
-                    check_output(["git", "describe"], cwd=os.path.dirname(os.path.dirname(medikit.__file__)))
-                    .decode("utf-8")
-                    .strip()
-                    + " (git)"
-                )
-            except:
-                version = (
-                    check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.dirname(medikit.__file__)))
-                    .decode("utf-8")
-                    .strip()[0:7]
-                    + " (git)"
-                )
-    except:
-        warnings.warn("Git repository found, but could not find version number from the repository.")
-
-    print(mondrian.term.lightwhite_bg(mondrian.term.red("  ✚  Medikit v." + version + "  ✚  ")))
+    if not options.pop("quiet", False):
+        print(mondrian.term.lightwhite_bg(mondrian.term.red("  ✚  Medikit v." + get_version() + "  ✚  ")))
 
     if len(more_args):
         return handler(config_filename, more=more_args, **options)
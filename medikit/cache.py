@@ -0,0 +1,122 @@
+"""
+Small on-disk cache, stored in the project (under ``.medikit/cache`` by default), used to avoid recomputing expensive
+but deterministic results (formatted code, ...) from one run to another.
+
+"""
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+ENCODING = "utf-8"
+
+
+def hash_key(*parts):
+    """
+    Build a cache key from a number of parts (strings or bytes).
+
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode(ENCODING)
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class FileCache:
+    """
+    One file per entry, in a cache directory. The cache size is bounded (in bytes), least recently used entries are
+    evicted first (entries modification time is updated on each hit).
+
+    The cache directory is only scanned once, on the first write, then entries sizes and usage order are tracked in
+    memory, so that writes do not depend on the number of entries (entries written meanwhile by other processes are
+    only accounted for by the next instances).
+
+    """
+
+    def __init__(self, path, *, max_size=16 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self._entries = None  # filename -> size, least recently used first
+        self._size = 0
+
+    def _get_entries(self):
+        if self._entries is None:
+            entries = []
+            for entry in os.scandir(self.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.path, st.st_size))
+            self._entries = OrderedDict((filename, size) for mtime, filename, size in sorted(entries))
+            self._size = sum(self._entries.values())
+        return self._entries
+
+    def _get_filename(self, key):
+        return os.path.join(self.path, key)
+
+    def get(self, key, default=None):
+        filename = self._get_filename(key)
+        try:
+            with open(filename, encoding=ENCODING) as f:
+                value = f.read()
+        except OSError:
+            return default
+
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+        if self._entries is not None and filename in self._entries:
+            self._entries.move_to_end(filename)
+        return value
+
+    def set(self, key, value):
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        fd, tmpname = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding=ENCODING) as f:
+            f.write(value)
+        filename = self._get_filename(key)
+        os.replace(tmpname, filename)
+
+        entries, size = self._get_entries(), os.path.getsize(filename)
+        self._size += size - entries.pop(filename, 0)
+        entries[filename] = size
+
+        self.evict()
+
+    def evict(self):
+        entries = self._get_entries()
+        while self._size > self.max_size and entries:
+            filename, size = entries.popitem(last=False)
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+            self._size -= size
+
+
+class NullCache:
+    """
+    Cache that never remembers anything.
+
+    """
+
+    def get(self, key, default=None):
+        return default
+
+    def set(self, key, value):
+        pass
+
+
+def get_cache(name, *, cache_dir, **kwargs):
+    """
+    Get a named cache, under the given cache directory, or a cache that does nothing if the cache directory is None.
+
+    """
+    if cache_dir is None:
+        return NullCache()
+    return FileCache(os.path.join(cache_dir, name), **kwargs)
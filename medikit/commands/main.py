@@ -6,6 +6,7 @@ class MedikitCommand(Command):
     def add_arguments(self, parser):
         parser.add_argument("--config", "-c", default="Projectfile")
         parser.add_argument("--verbose", "-v", action="store_true", default=False)
+        parser.add_argument("--quiet", "-q", action="store_true", default=False, help="Do not display the banner.")
 
         with self.create_child("command", required=True) as actions:
             # todo aliases for update/init
@@ -1,12 +1,23 @@
+import contextlib
 import datetime
+import glob
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from mondrian import term
 
 from medikit.commands.base import Command
 from medikit.commands.utils import _read_configuration
 from medikit.events import LoggingDispatcher
-from medikit.pipeline import ConfiguredPipeline, get_identity, logger
+from medikit.pipeline import ConfiguredPipeline, StepCache, get_identity, logger
+from medikit.steps.utils.process import LEGACY_CHILD_WATCHER, forward_signals
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
 
 START = "start"
 CONTINUE = "continue"
@@ -16,14 +27,64 @@ COMPLETE = "complete"
 QUIT = "quit"
 
 
+@contextlib.contextmanager
+def lock_state(filename):
+    """
+    Hold an exclusive advisory lock on a pipeline state file, waiting for other medikit processes holding it to release
+    it. The lock is taken on a sibling ".lock" file, as the state file itself is replaced on each write.
+
+    :param str filename: pipeline state filename
+    """
+    with open(filename + ".lock", "a") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def write_state(filename, content):
+    """
+    Atomically replace a pipeline state file: content is written and synced to a temporary file in the same directory,
+    which is then renamed over the state file. A crash can leave the old state, or the new one, but never a partial one.
+
+    :param str filename: pipeline state filename
+    :param str content: serialized pipeline state
+    """
+    dirname = os.path.dirname(filename) or "."
+    fd, tmpname = tempfile.mkstemp(dir=dirname, prefix="." + os.path.basename(filename) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpname, filename)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+    if hasattr(os, "O_DIRECTORY"):
+        # make the rename itself durable
+        dirfd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
+
+
 class PipelineCommand(Command):
     def add_arguments(self, parser):
         parser.add_argument("pipeline", default=None, nargs="?")
         parser.add_argument("action", choices=(START, CONTINUE, ABORT, SHOW), nargs="?")
         parser.add_argument("--force", "-f", action="store_true")
+        parser.add_argument(
+            "--jobs", "-j", type=int, default=None, help="Run up to that many independent steps concurrently."
+        )
 
     @classmethod
-    def handle(cls, config_filename, *, pipeline, action, force=False, verbose=False):
+    def handle(cls, config_filename, *, pipeline, action, force=False, verbose=False, jobs=None):
         dispatcher = LoggingDispatcher()
         variables, features, files, config = _read_configuration(dispatcher, config_filename)
 
@@ -45,6 +106,7 @@ class PipelineCommand(Command):
         path = os.path.dirname(config_filename)
         pipeline_file = os.path.join(path, ".medikit/pipelines", pipeline.name + ".json")
         pipeline_dirname = os.path.dirname(pipeline_file)
+        cache_file = os.path.join(pipeline_dirname, pipeline.name + ".cache")
         if not os.path.exists(pipeline_dirname):
             os.makedirs(pipeline_dirname)
         elif not os.path.isdir(pipeline_dirname):
@@ -55,28 +117,37 @@ class PipelineCommand(Command):
         if not action:
             raise RuntimeError("Choose a pipeline action: start, continue, abort.")
 
-        while action:
-            if action == SHOW:
-                action = cls._handle_show(pipeline, filename=pipeline_file)
-            elif action == START:
-                action = cls._handle_start(pipeline, filename=pipeline_file, force=force)
-            elif action == CONTINUE:
-                action = cls._handle_continue(pipeline, filename=pipeline_file)
-            elif action == ABORT:
-                action = cls._handle_abort(pipeline, filename=pipeline_file)
-            elif action == COMPLETE:
-                target = os.path.join(
-                    ".medikit/pipelines",
-                    pipeline.name + "." + str(datetime.datetime.now()).replace(":", ".").replace(" ", ".") + ".json",
-                )
-                os.rename(pipeline_file, os.path.join(path, target))
-                logger.info("Pipeline complete. State saved as “{}”.".format(target))
-                break
-            elif action == QUIT:
-                break
-            else:
-                raise ValueError("Invalid action “{}”.".format(action))
-            force = False
+        if action == SHOW:
+            # read-only, does not need the lock.
+            cls._handle_show(pipeline, filename=pipeline_file)
+            return
+
+        # Actions read and write the state under lock, so that concurrent invocations (for example, retried CI jobs)
+        # can only see and run steps one after the other. The lock is held until the last chained action (a pipeline
+        # completed by one invocation is then seen as finished by the others).
+        with lock_state(pipeline_file):
+            while action:
+                if action == START:
+                    action = cls._handle_start(pipeline, filename=pipeline_file, force=force)
+                elif action == CONTINUE:
+                    action = cls._handle_continue(
+                        pipeline, filename=pipeline_file, jobs=jobs, cache=StepCache(cache_file)
+                    )
+                elif action == ABORT:
+                    StepCache(cache_file).clear()
+                    action = cls._handle_abort(pipeline, filename=pipeline_file)
+                elif action == COMPLETE:
+                    StepCache(cache_file).clear()
+                    timestamp = str(datetime.datetime.now()).replace(":", ".").replace(" ", ".")
+                    target = os.path.join(".medikit/pipelines", pipeline.name + "." + timestamp + ".json")
+                    os.rename(pipeline_file, os.path.join(path, target))
+                    logger.info("Pipeline complete. State saved as “{}”.".format(target))
+                    break
+                elif action == QUIT:
+                    break
+                else:
+                    raise ValueError("Invalid action “{}”.".format(action))
+                force = False
 
     @classmethod
     def _handle_show(cls, pipeline, *, filename):
@@ -99,28 +170,46 @@ class PipelineCommand(Command):
         pipeline.init()
 
         # Write the new, empty state file
-        with open(filename, "w+") as f:
-            f.write(pipeline.serialize())
+        write_state(filename, pipeline.serialize())
 
         # "Continue", until step 1.
         return CONTINUE
 
     @classmethod
-    def _handle_continue(cls, pipeline, *, filename):
+    def _handle_continue(cls, pipeline, *, filename, jobs=None, cache=None):
         if not os.path.exists(filename):
+            # another invocation may have completed it while this one was waiting for the lock.
+            finished = sorted(glob.glob(os.path.join(os.path.dirname(filename), pipeline.name + ".*.json")))
+            if finished:
+                logger.info(
+                    "Pipeline “{}” finished, state saved as “{}”. Use `medikit pipeline {} start` to run it again.".format(
+                        pipeline.name, os.path.relpath(finished[-1]), pipeline.name
+                    )
+                )
+                return QUIT
             raise FileNotFoundError(
-                "Pipeline “{}” not started, hence you cannot “continue” it. Are you looking for `medikit pipeline {name} start`?".format(
+                "Pipeline “{name}” not started, hence you cannot “continue” it. Are you looking for `medikit pipeline {name} start`?".format(
                     name=pipeline.name
                 )
             )
 
-        # XXX TODO add a lock file during the step and unlock at the end.
         with open(filename) as f:
             pipeline.unserialize(f.read())
 
         try:
-            step = pipeline.next()
-            name, current, size, descr = pipeline.name, pipeline.current, len(pipeline), str(step)
+            pipeline.next()
+        except StopIteration:
+            return COMPLETE
+
+        # Run all the steps that are ready (dependencies complete) concurrently, or only the first one.
+        steps = pipeline.get_ready_steps()
+        if not jobs or jobs < 2 or LEGACY_CHILD_WATCHER:
+            steps = steps[:1]
+
+        lock = threading.Lock()
+
+        def run(step):
+            name, current, size, descr = pipeline.name, pipeline.get_position(step), len(pipeline), str(step)
             logger.info(
                 term.black(" » ").join(
                     (
@@ -130,11 +219,26 @@ class PipelineCommand(Command):
                     )
                 )
             )
-            step.run(pipeline.meta)
+            try:
+                if cache and cache.is_valid(step):
+                    step.set_cached()
+                else:
+                    step.run(pipeline.meta)
+            finally:
+                # Persist each step progress as soon as possible (including the progress of failed steps, for example
+                # the remotes it already pushed to), so that other steps failing does not lose it.
+                with lock:
+                    if step.complete and cache and not step.cached:
+                        cache.set(step)
+                        cache.write()
+                    write_state(filename, pipeline.serialize())
             if step.complete:
                 logger.info(
                     term.black(" » ").join(
-                        (term.lightblue("{} ({}/{})".format(name.upper(), current, size)), term.green("SUCCESS"))
+                        (
+                            term.lightblue("{} ({}/{})".format(name.upper(), current, size)),
+                            term.green("SUCCESS (CACHED)" if step.cached else "SUCCESS"),
+                        )
                     )
                     + "\n"
                 )
@@ -145,13 +249,19 @@ class PipelineCommand(Command):
                     )
                     + "\n"
                 )
-                return
+            return step.complete
 
-        except StopIteration:
-            return COMPLETE
+        if len(steps) == 1:
+            results = [run(steps[0])]
+        else:
+            # Worker threads cannot install signal handlers, so the main thread forwards them to the running commands.
+            with forward_signals(), ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(run, step) for step in steps]
+                wait(futures)
+            results = [future.result() for future in futures]
 
-        with open(filename, "w+") as f:
-            f.write(pipeline.serialize())
+        if not all(results):
+            return
 
         return CONTINUE
 
@@ -1,10 +1,14 @@
+import os
+
 from mondrian import term
 
 import medikit
 from medikit.commands.base import Command
 from medikit.commands.utils import _read_configuration
-from medikit.config.loader import load_feature_extensions
-from medikit.events import LoggingDispatcher, ProjectEvent
+from medikit.config.loader import load_feature
+from medikit.events import ListenerProfiler, LoggingDispatcher, ProjectEvent
+from medikit.file import UNCHANGED, WRITTEN, get_file_stats, get_rendered_files
+from medikit.fingerprint import FINGERPRINT_FILE, get_inputs_fingerprint, is_up_to_date, write_fingerprint
 
 
 def write_resources(event):
@@ -14,6 +18,30 @@ def write_resources(event):
 class UpdateCommand(Command):
     def add_arguments(self, parser):
         parser.add_argument("--override-requirements", action="store_true")
+        parser.add_argument(
+            "--upgrade",
+            action="store_true",
+            help="Resolve all requirements again, ignoring the lock file (implies --override-requirements).",
+        )
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="Resolve requirements using only cached packages metadata and local wheelhouses.",
+        )
+        parser.add_argument(
+            "--force", "-f", action="store_true", help="Update even if nothing changed since the last update."
+        )
+        parser.add_argument(
+            "--profile", action="store_true", help="Display time spent in each feature listener, slowest first."
+        )
+        parser.add_argument("--profile-output", help="Write time spent in each feature listener to a JSON file.")
+        parser.add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=None,
+            help="Run independent feature listeners of a same priority concurrently, using that many threads.",
+        )
 
     @staticmethod
     def handle(config_filename, **kwargs):
@@ -22,13 +50,30 @@ class UpdateCommand(Command):
         logger = logging.getLogger()
 
         dispatcher = LoggingDispatcher()
+        dispatcher.max_workers = kwargs.pop("jobs", None)
+
+        profile, profile_output = kwargs.pop("profile", False), kwargs.pop("profile_output", None)
+        if profile or profile_output:
+            dispatcher.profiler = ListenerProfiler()
 
         variables, features, files, config = _read_configuration(dispatcher, config_filename)
 
         # This is a hack, but we'd need a flexible option parser which requires too much work as of today.
-        if kwargs.pop("override_requirements", False):
+        upgrade = kwargs.pop("upgrade", False)
+        override_requirements = kwargs.pop("override_requirements", False) or upgrade
+        if override_requirements:
             if "python" in config:
                 config["python"].override_requirements = True
+                config["python"].upgrade_requirements = upgrade
+        if kwargs.pop("offline", False):
+            if "python" in config:
+                config["python"].offline = True
+
+        fingerprint_file = os.path.join(os.path.dirname(config_filename), FINGERPRINT_FILE)
+        fingerprint = get_inputs_fingerprint(config_filename, features=features, variables=variables)
+        if not (kwargs.pop("force", False) or override_requirements) and is_up_to_date(fingerprint_file, fingerprint):
+            logger.info("Nothing changed since last update, use --force to update anyway.")
+            return
 
         feature_instances = {}
         logger.info(
@@ -38,30 +83,23 @@ class UpdateCommand(Command):
             )
         )
 
-        all_features = load_feature_extensions()
-
         sorted_features = sorted(features)  # sort to have a predictable display order
         for feature_name in sorted_features:
             logger.debug('Initializing feature "{}"...'.format(term.bold(term.green(feature_name))))
             try:
-                feature = all_features[feature_name]
-            except KeyError as exc:
-                logger.exception('Feature "{}" not found.'.format(feature_name))
+                feature = load_feature(feature_name)
+            except ValueError as exc:
+                raise RuntimeError("Required feature {} not found.".format(feature_name)) from exc
 
-            if feature:
-                feature_instances[feature_name] = feature(dispatcher)
+            feature_instances[feature_name] = feature(dispatcher)
 
-                for req in feature_instances[feature_name].requires:
-                    if not req in sorted_features:
-                        raise RuntimeError('Unmet dependency: "{}" requires "{}".'.format(feature_name, req))
+            for req in feature_instances[feature_name].requires:
+                if not req in sorted_features:
+                    raise RuntimeError('Unmet dependency: "{}" requires "{}".'.format(feature_name, req))
 
-                for con in feature_instances[feature_name].conflicts:
-                    if con in sorted_features:
-                        raise RuntimeError(
-                            'Conflicting dependency: "{}" conflicts with "{}".'.format(con, feature_name)
-                        )
-            else:
-                raise RuntimeError("Required feature {} not found.".format(feature_name))
+            for con in feature_instances[feature_name].conflicts:
+                if con in sorted_features:
+                    raise RuntimeError('Conflicting dependency: "{}" conflicts with "{}".'.format(con, feature_name))
 
         event = ProjectEvent(config=config)
         event.variables, event.files = variables, files
@@ -72,4 +110,12 @@ class UpdateCommand(Command):
 
         dispatcher.dispatch(medikit.on_end, event)
 
-        logger.info("Done.")
+        write_fingerprint(fingerprint_file, fingerprint, [*get_rendered_files(dispatcher), *config.resources])
+
+        stats = get_file_stats(dispatcher)
+        logger.info("Done ({} files written, {} unchanged).".format(stats[WRITTEN], stats[UNCHANGED]))
+
+        if profile:
+            print(dispatcher.profiler.format_summary())
+        if profile_output:
+            dispatcher.profiler.write_summary(profile_output)
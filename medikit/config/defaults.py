@@ -6,7 +6,12 @@ def setup_default_pipelines(config):
     with config.pipeline("release") as release:
         release.add(steps.Install())
         release.add(steps.BumpVersion())
-        release.add(steps.Make("update-requirements"))
-        release.add(steps.Make("clean install"))  # test docs
+        release.add(
+            steps.Make("update-requirements", inputs=("Projectfile", "setup.py"), outputs=("requirements*.txt",))
+        )
+        # test docs
+        release.add(
+            steps.Make("clean install", inputs=("setup.py", "requirements*.txt"), outputs=(".medikit/install",))
+        )
         release.add(steps.System("git add -p .", interractive=True))
         release.add(steps.Commit("Release: {version}", tag=True))
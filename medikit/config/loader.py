@@ -1,15 +1,88 @@
-from stevedore import ExtensionManager
+"""
+Lazy index of the features available as "medikit.feature" entry points.
 
+Entry points are discovered only once per process, from the installed distributions metadata (importlib.metadata, or
+pkg_resources before python 3.8), and a feature module is only imported when the feature is actually required.
+
+"""
+import logging
+
+NAMESPACE = "medikit.feature"
+
+logger = logging.getLogger(__name__)
+
+_entry_points = None
+_versions = None
 _all_features = {}
 
 
-def load_feature_extensions():
-    if not _all_features:
+def get_feature_entry_points():
+    global _entry_points, _versions
+    if _entry_points is None:
+        _entry_points, _versions = {}, {}
+        for entry_point, version in _iter_entry_points(NAMESPACE):
+            if not entry_point.name in _entry_points:
+                _entry_points[entry_point.name], _versions[entry_point.name] = entry_point, version
+    return _entry_points
+
+
+def get_feature_versions(names):
+    """
+    Versions of the distributions providing the given features (medikit itself, or third party plugins).
+
+    :param iterable names: feature names
+    :return dict: feature name -> version (None for unknown features)
+    """
+    get_feature_entry_points()
+    return {name: _versions.get(name) for name in names}
+
+
+def _iter_entry_points(group):
+    """
+    :return iterable: (entry point, version of the distribution providing it) pairs, first distributions in path first.
+    """
+    try:
+        from importlib.metadata import distributions
+    except ImportError:  # python < 3.8
+        from pkg_resources import iter_entry_points
 
-        def register_feature(ext, all_features=_all_features):
-            all_features[ext.name] = ext.plugin
+        return ((entry_point, entry_point.dist.version) for entry_point in iter_entry_points(group))
 
-        mgr = ExtensionManager(namespace="medikit.feature")
-        mgr.map(register_feature)
+    return (
+        (entry_point, distribution.version)
+        for distribution in distributions()
+        for entry_point in distribution.entry_points
+        if entry_point.group == group
+    )
+
+
+def get_feature_names():
+    return sorted(get_feature_entry_points())
+
+
+def load_feature(name):
+    """
+    Load a feature class by name, importing its module only the first time it is asked for.
+
+    """
+    if not name in _all_features:
+        try:
+            entry_point = get_feature_entry_points()[name]
+        except KeyError as exc:
+            raise ValueError("Unknown feature {!r}.".format(name)) from exc
+
+        try:
+            _all_features[name] = entry_point.load()
+        except Exception:
+            logger.exception("Exception caught while loading {}.".format(entry_point))
+            raise
+
+    return _all_features[name]
+
+
+def load_feature_extensions():
+    """
+    Load all available features (used for documentation purposes, prefer `load_feature(...)`).
 
-    return _all_features
+    """
+    return {name: load_feature(name) for name in get_feature_names()}
@@ -1,14 +1,15 @@
 import logging
 import os
 import runpy
+import threading
 from collections import OrderedDict
 from contextlib import contextmanager
 
 from mondrian import term
-from stevedore import ExtensionManager
 from whistle import EventDispatcher
 
 import medikit
+from medikit.config.loader import load_feature
 from medikit.pipeline import Pipeline
 from medikit.utils import run_command
 
@@ -18,21 +19,12 @@ logger = logging.getLogger(__name__)
 class ConfigurationRegistry:
     def __init__(self, dispatcher: EventDispatcher):
         self._configs = {}
-        self._features = {}
         self._pipelines = {}
         self._variables = OrderedDict()
 
         self.dispatcher = dispatcher
         self.resources = OrderedDict()
-
-        def register_feature(ext):
-            self._features[ext.name] = ext.plugin
-
-        def on_load_feature_failure(mgr, entrypoint, err):
-            logger.exception("Exception caught while loading {}.".format(entrypoint), err)
-
-        mgr = ExtensionManager(namespace="medikit.feature", on_load_failure_callback=on_load_feature_failure)
-        mgr.map(register_feature)
+        self._resources_lock = threading.RLock()
 
         dispatcher.add_listener(medikit.on_end, self.write_resources)
 
@@ -107,35 +99,36 @@ class ConfigurationRegistry:
         return self._pipelines
 
     def _require(self, name):
-        if not name in self._features:
-            raise ValueError("Unknown feature {!r}.".format(name))
-
         if name not in self._configs:
-            self._configs[name] = self._features[name].Config()
+            self._configs[name] = load_feature(name).Config()
 
         return self._configs[name]
 
     def get_resource(self, target):
-        if not target in self.resources:
-            raise RuntimeError(
-                'Resource for "{}" is not defined, you must define it first by providing an implementation.'.format(
-                    target
+        with self._resources_lock:
+            if not target in self.resources:
+                raise RuntimeError(
+                    'Resource for "{}" is not defined, you must define it first by providing an implementation.'.format(
+                        target
+                    )
                 )
-            )
-        return self.resources[target]
+            return self.resources[target]
 
     def define_resource(self, ResourceType, target, *args, **kwargs):
-        if target in self.resources:
-            raise RuntimeError(
-                'Resource for "{}" is already defined as {!r}, you can only enhance it at this point.'.format(
-                    target, self.resources[target]
+        with self._resources_lock:
+            if target in self.resources:
+                raise RuntimeError(
+                    'Resource for "{}" is already defined as {!r}, you can only enhance it at this point.'.format(
+                        target, self.resources[target]
+                    )
                 )
-            )
-        self.resources[target] = ResourceType(*args, **kwargs)
-        return self.resources[target]
+            self.resources[target] = ResourceType(*args, **kwargs)
+            return self.resources[target]
 
     def write_resources(self, event):
-        for target, resource in self.resources.items():
+        with self._resources_lock:
+            resources = list(self.resources.items())
+        for target, resource in resources:
             exists = os.path.exists(target)
-            resource.write(event, target)
-            self.dispatcher.info(term.bold((term.red if exists else term.green)("W!")), target)
+            if resource.write(event, target) is not False:
+                self.dispatcher.info(term.bold((term.red if exists else term.green)("W!")), target)
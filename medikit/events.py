@@ -1,6 +1,12 @@
+import functools
+import itertools
+import json
 import logging
 import textwrap
+import threading
+import time
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from mondrian import term
 from whistle import Event, EventDispatcher
@@ -27,9 +33,128 @@ class ProjectEvent(Event):
         super(ProjectEvent, self).__init__()
 
 
+class ListenerProfiler:
+    """
+    Collects wall and cpu time spent in each listener (for each event it listens to). Times are inclusive: a listener
+    dispatching another event is also accounted for the time spent in the nested listeners.
+
+    """
+
+    def __init__(self):
+        self.records = OrderedDict()
+        # listeners may run in worker threads (see LoggingDispatcher.max_workers), and updating a record is not atomic.
+        self._lock = threading.Lock()
+
+    def wrap(self, event_id, listener):
+        name = getattr(listener, "__qualname__", None) or repr(listener)
+        with self._lock:
+            record = self.records.setdefault((event_id, name), {"calls": 0, "wall": 0.0, "cpu": 0.0})
+
+        @functools.wraps(listener)
+        def profiled_listener(event):
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                return listener(event)
+            finally:
+                wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+                with self._lock:
+                    record["calls"] += 1
+                    record["wall"] += wall
+                    record["cpu"] += cpu
+
+        return profiled_listener
+
+    def get_summary(self):
+        """
+        Called listeners, sorted by decreasing wall time.
+
+        :return list: dicts with event, listener, calls, wall and cpu keys.
+        """
+        with self._lock:
+            rows = [
+                {"event": event_id, "listener": name, **record}
+                for (event_id, name), record in self.records.items()
+                if record["calls"]
+            ]
+        return sorted(rows, key=lambda row: row["wall"], reverse=True)
+
+    def format_summary(self):
+        lines = ["{:>9} {:>9} {:>6}  {}".format("wall (s)", "cpu (s)", "calls", "listener (event)")]
+        for row in self.get_summary():
+            lines.append("{wall:>9.3f} {cpu:>9.3f} {calls:>6}  {listener} ({event})".format(**row))
+        return "\n".join(lines)
+
+    def write_summary(self, filename):
+        with open(filename, "w+") as f:
+            json.dump(self.get_summary(), f, indent=4)
+
+
+def get_listener_resources(listener):
+    """
+    What a listener declared it reads and writes (see ``subscribe``), or None if it did not declare anything, in which
+    case it must be assumed to possibly read and write everything.
+
+    :return tuple|NoneType: (reads, writes) frozensets
+    """
+    return getattr(listener, "__resources__", None)
+
+
+def _conflicts(a, b):
+    a, b = get_listener_resources(a), get_listener_resources(b)
+    if a is None or b is None:
+        return True
+    (a_reads, a_writes), (b_reads, b_writes) = a, b
+    return bool(a_writes & (b_reads | b_writes) or b_writes & a_reads)
+
+
+def get_batches(listeners):
+    """
+    Split listeners (of a same priority) into batches that can run concurrently. A listener comes in the batch following
+    the last one containing a listener it conflicts with, so that conflicting listeners always run in registration
+    order (hence, with deterministic results), whatever the threads scheduling.
+
+    :param list listeners:
+    :return list: list of lists of listeners
+    """
+    batches, positions = [], []
+    for i, listener in enumerate(listeners):
+        position = max((positions[j] + 1 for j in range(i) if _conflicts(listeners[j], listener)), default=0)
+        if position == len(batches):
+            batches.append([])
+        batches[position].append(listener)
+        positions.append(position)
+    return batches
+
+
+_worker = threading.local()
+
+
 class LoggingDispatcher(EventDispatcher):
     logger = logging.getLogger()
     indent_level = 0
+    profiler = None
+
+    # Number of threads used to run listeners of a same priority concurrently (None or 1 means sequential dispatch).
+    max_workers = None
+
+    _indent_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        super(LoggingDispatcher, self).__init__(*args, **kwargs)
+        self._priorities = {}
+
+    def add_listener(self, event_id, listener, priority=0):
+        if self.profiler is not None:
+            listener = self.profiler.wrap(event_id, listener)
+        self._priorities.setdefault(event_id, {})[id(listener)] = priority
+        return super(LoggingDispatcher, self).add_listener(event_id, listener, priority=priority)
+
+    def listen(self, event_id, priority=0):
+        def wrapper(listener):
+            self.add_listener(event_id, listener, priority=priority)
+            return listener
+
+        return wrapper
 
     @property
     def indent(self):
@@ -43,13 +168,48 @@ class LoggingDispatcher(EventDispatcher):
                 + term.bold(">")
                 + " dispatch ⚡ {} ({})".format(term.bold(term.blue(event_id)), type(event or Event).__name__)
             )
-        type(self).indent_level += 1
-        event = super(LoggingDispatcher, self).dispatch(event_id, event)
-        type(self).indent_level -= 1
+        with self._indent_lock:
+            type(self).indent_level += 1
+        try:
+            if self.max_workers and self.max_workers > 1 and not getattr(_worker, "active", False):
+                event = self._dispatch_concurrently(event_id, event)
+            else:
+                event = super(LoggingDispatcher, self).dispatch(event_id, event)
+        finally:
+            with self._indent_lock:
+                type(self).indent_level -= 1
         if should_log:
             self.logger.info(self.indent + term.bold("<") + " {}".format(term.lightblack("dispatched " + event_id)))
         return event
 
+    def _dispatch_concurrently(self, event_id, event=None):
+        """
+        Priorities are still honored, but listeners of a same priority are run in a thread pool, batch by batch (see
+        ``get_batches``). Events dispatched from within a listener running in the pool are dispatched sequentially.
+
+        """
+        if event is None:
+            event = Event()
+        event.name = event_id
+        event.dispatcher = self
+
+        priorities = self._priorities.get(event_id, {})
+        listeners = self.get_listeners(event_id)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for priority, band in itertools.groupby(listeners, key=lambda listener: priorities.get(id(listener), 0)):
+                for batch in get_batches(list(band)):
+                    if len(batch) == 1:
+                        batch[0](event)
+                    else:
+                        futures = [executor.submit(_run_in_worker, listener, event) for listener in batch]
+                        wait(futures)
+                        for future in futures:
+                            future.result()  # raise the first error, in registration order
+                    if event.propagation_stopped:
+                        return event
+        return event
+
     def debug(self, feature, *messages):
         return self.logger.debug("   ✔ " + term.bold(term.green(feature.__shortname__)) + " ".join(map(str, messages)))
 
@@ -57,12 +217,25 @@ class LoggingDispatcher(EventDispatcher):
         return self.logger.info(self.indent + term.lightblack("∙") + " " + " ".join(map(str, messages)))
 
 
-def subscribe(event_id, priority=0):
+def _run_in_worker(listener, event):
+    _worker.active = True
+    try:
+        return listener(event)
+    finally:
+        _worker.active = False
+
+
+def subscribe(event_id, priority=0, *, reads=None, writes=None):
     """
     Lazy event subscription. Will need to be attached to an event dispatcher using ``attach_subscriptions``
 
+    Listeners can declare the resources (usually file names) they read and write, allowing a concurrent dispatcher to
+    run them alongside other listeners of the same priority. Listeners that do not declare anything always run alone.
+
     :param str event_id:
     :param int priority:
+    :param iterable reads: names of the resources read by the listener
+    :param iterable writes: names of the resources written by the listener
     :return:
     """
 
@@ -76,6 +249,8 @@ def subscribe(event_id, priority=0):
                 f.__doc__ += "\n"
 
         f.__subscriptions__[event_id] = priority
+        if reads is not None or writes is not None:
+            f.__resources__ = (frozenset(reads or ()), frozenset(writes or ()))
         f.__doc__ += "\nListens to ``{}`` event *(priority: {})*".format(event_id, priority)
 
         return f
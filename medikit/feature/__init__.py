@@ -1,13 +1,14 @@
+import importlib.util
 import logging
 import os
+import threading
 from collections import OrderedDict
 from contextlib import ContextDecorator
 
-from jinja2 import Environment, PackageLoader, Template
 from mondrian import term
-from yapf import yapf_api
 
 from medikit import settings
+from medikit.cache import get_cache, hash_key
 from medikit.events import attach_subscriptions
 from medikit.file import File
 from medikit.settings import DEFAULT_FEATURES
@@ -21,14 +22,77 @@ SUPPORT_PRIORITY = -20
 LAST_PRIORITY = 100
 
 
+def _get_yapf_cache_key(style_config):
+    """
+    Identify yapf version (without importing it, which is the slow part we want to avoid) and style.
+
+    """
+    spec = importlib.util.find_spec("yapf")
+    yapf_version = (spec.origin, os.stat(spec.origin).st_mtime) if spec and spec.origin else None
+    if style_config and os.path.isfile(style_config):
+        with open(style_config, "rb") as f:
+            return yapf_version, style_config, f.read()
+    return yapf_version, style_config
+
+
+INLINE_TEMPLATE_PREFIX = "<inline>/"
+
+
+def _create_jinja_environment(cache_dir=None):
+    """
+    Create the jinja environment used to render templates, both from the package "template" directory and inline
+    templates (registered by source hash, see `Feature.get_inline_template`). If a cache directory is given, compiled
+    templates are persisted there so that later runs do not need to compile them again.
+
+    """
+    from jinja2 import BaseLoader, ChoiceLoader, Environment, FileSystemBytecodeCache, PackageLoader, TemplateNotFound
+
+    class InlineLoader(BaseLoader):
+        def __init__(self):
+            self.sources = {}
+
+        def add(self, source):
+            name = INLINE_TEMPLATE_PREFIX + hash_key(source)
+            self.sources[name] = source
+            return name
+
+        def get_source(self, environment, template):
+            if not template in self.sources:
+                raise TemplateNotFound(template)
+            return self.sources[template], None, lambda: True
+
+        def list_templates(self):
+            return sorted(self.sources)
+
+    bytecode_cache = None
+    if cache_dir is not None:
+        bytecode_cache_dir = os.path.join(cache_dir, "jinja")
+        if not os.path.exists(bytecode_cache_dir):
+            os.makedirs(bytecode_cache_dir)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+
+    inline_loader = InlineLoader()
+    environment = Environment(
+        loader=ChoiceLoader([inline_loader, PackageLoader(__name__, "template")]), bytecode_cache=bytecode_cache
+    )
+    environment.inline_loader = inline_loader
+    return environment
+
+
 class Feature(object):
-    _jinja_environment = None
+    _jinja_environments = {}
+    _jinja_lock = threading.Lock()
+
+    # yapf uses a global style, so formatting must not happen in more than one thread at once.
+    _yapf_lock = threading.Lock()
 
     requires = set()
     conflicts = set()
 
     file_type = staticmethod(File)
 
+    cache_dir = settings.CACHE_DIR
+
     __usage__ = None
 
     class Config(ContextDecorator):
@@ -63,13 +127,22 @@ class Feature(object):
 
     @property
     def jinja(self):
-        if type(self)._jinja_environment is None:
-            type(self)._jinja_environment = Environment(loader=PackageLoader(__name__, "template"))
-        return type(self)._jinja_environment
-
-    def _log_file(self, target, override, content=()):
+        # shared by all features, one per cache directory
+        cache_dir = os.path.abspath(self.cache_dir) if self.cache_dir is not None else None
+        with Feature._jinja_lock:
+            if not cache_dir in Feature._jinja_environments:
+                Feature._jinja_environments[cache_dir] = _create_jinja_environment(cache_dir)
+            return Feature._jinja_environments[cache_dir]
+
+    def get_inline_template(self, template_string):
+        jinja = self.jinja
+        return jinja.get_template(jinja.inline_loader.add(template_string))
+
+    def _log_file(self, target, override, content=(), *, size=None):
         self.dispatcher.info(
-            term.bold(term.red("W!") if override else term.green("W?")), target, "({} bytes)".format(len(content))
+            term.bold(term.red("W!") if override else term.green("W?")),
+            target,
+            "({} bytes)".format(len(content) if size is None else size),
         )
 
     def render(self, template, context=None):
@@ -81,20 +154,35 @@ class Feature(object):
         with self.file(target, executable=executable, override=override) as f:
             content = format_file_content(self.render(template, context))
             if force_python or target.endswith(".py"):
-                content, modified = yapf_api.FormatCode(content, filename=target)
+                content = self.format_python(content, filename=target)
             f.write(content)
             self._log_file(target, override, content)
 
     def render_file_inline(self, target, template_string, context=None, override=False, force_python=False):
         with self.file(target, override=override) as f:
-            content = format_file_content(Template(template_string).render(**(context or {})))
+            content = format_file_content(self.get_inline_template(template_string).render(**(context or {})))
             if force_python or target.endswith(".py"):
-                content, modified = yapf_api.FormatCode(
-                    content, filename=target, style_config=settings.YAPF_STYLE_CONFIG
-                )
+                content = self.format_python(content, filename=target, style_config=settings.YAPF_STYLE_CONFIG)
             f.write(content)
             self._log_file(target, override, content)
 
+    def format_python(self, content, *, filename, style_config=None):
+        """
+        Format python code using yapf. As yapf is slow, results are cached (by content, style and yapf version) so that
+        unchanged renders do not need yapf at all.
+
+        """
+        key = hash_key(content, *_get_yapf_cache_key(style_config))
+        cache = get_cache("yapf", cache_dir=self.cache_dir)
+        formatted = cache.get(key)
+        if formatted is None:
+            from yapf import yapf_api
+
+            with Feature._yapf_lock:
+                formatted, modified = yapf_api.FormatCode(content, filename=filename, style_config=style_config)
+            cache.set(key, formatted)
+        return formatted
+
     def render_empty_files(self, *targets, **kwargs):
         override = kwargs.pop("override", False)
         for target in targets:
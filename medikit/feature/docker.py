@@ -2,7 +2,11 @@
 Adds docker capabilities to your package, using either "docker build" or "rocker build" to create an image containing
 your code, in a fully functionnal python virtualenv.
 
+The "buildkit" builder generates a multi-stage Dockerfile where python dependencies are installed from the requirements
+only (with a persistent pip cache), so that changing the code only rebuilds the last, small layers.
+
 """
+
 from argparse import Namespace
 
 import medikit
@@ -15,6 +19,7 @@ DEFAULT_NAME = "$(shell echo $(PACKAGE) | tr A-Z a-z)"
 
 DOCKER = "docker"
 ROCKER = "rocker"
+BUILDKIT = "buildkit"
 
 
 class DockerConfig(Feature.Config):
@@ -48,7 +53,7 @@ class DockerConfig(Feature.Config):
     @property
     def build_file(self):
         if self._build_file is None:
-            return self.builder.title() + "file"
+            return "Dockerfile" if self.builder == BUILDKIT else self.builder.title() + "file"
         return self._build_file
 
     @build_file.setter
@@ -126,6 +131,33 @@ class DockerConfig(Feature.Config):
         self.scripts.build.set("$(ROCKER_BUILD) $(ROCKER_BUILD_OPTIONS) $(ROCKER_BUILD_VARIABLES) .")
         self.scripts.push.set('ROCKER_BUILD_OPTIONS="$(ROCKER_BUILD_OPTIONS) --push" $(MAKE) docker-build')
 
+    def use_buildkit_builder(self):
+        """
+        Use docker with BuildKit, and a generated multi-stage Dockerfile caching python dependencies. Build cache can be
+        imported and exported using ``DOCKER_CACHE_FROM`` and ``DOCKER_CACHE_TO`` (the later requires
+        ``USE_BUILDX=1``), for example ``make docker-build DOCKER_CACHE_FROM=$(DOCKER_IMAGE):latest``.
+
+        """
+        self.use_default_builder()
+
+        self.builder = BUILDKIT
+
+        variables = self._get_default_variables()
+        variables["DOCKER_BUILD_OPTIONS"] += " ".join(
+            (
+                " --build-arg BUILDKIT_INLINE_CACHE=1",
+                "$(if $(DOCKER_CACHE_FROM),--cache-from=$(DOCKER_CACHE_FROM))",
+                "$(if $(DOCKER_CACHE_TO),--cache-to=$(DOCKER_CACHE_TO))",
+            )
+        )
+        self._variables = [
+            variables,
+            self._get_default_image_variables(),
+            dict(DOCKER_BUILDKIT="1", DOCKER_CACHE_FROM="", DOCKER_CACHE_TO=""),
+        ]
+
+        self.scripts.build.set("DOCKER_BUILDKIT=$(DOCKER_BUILDKIT) " + str(self.scripts.build))
+
     @property
     def variables(self):
         for variables in self._variables:
@@ -136,6 +168,24 @@ class DockerConfig(Feature.Config):
         return "/".join(filter(None, (self._registry, self._user, self._name)))
 
 
+def _get_python_context(config):
+    """
+    Requirements file (and wheelhouse, if enabled) to install in the image, preferring the "prod" extra if any.
+
+    """
+    if not "python" in config:
+        return {"requirements_file": "requirements.txt", "wheelhouse": None}
+
+    from medikit.feature.python import _get_wheelhouse
+
+    python_config = config["python"]
+    extra = "prod" if "prod" in python_config.get_extras() else None
+    return {
+        "requirements_file": "-".join(filter(None, ("requirements", extra))) + ".txt",
+        "wheelhouse": _get_wheelhouse(extra) if python_config.use_wheelhouse else None,
+    }
+
+
 class DockerFeature(Feature):
     Config = DockerConfig
 
@@ -156,7 +206,13 @@ class DockerFeature(Feature):
         for script_name, script_content in sorted(docker_config.scripts.__dict__.items()):
             event.makefile.add_target("docker-" + script_name, script_content, phony=True, doc=script_content.doc)
 
-    @subscribe(medikit.on_end)
+        # The buildkit dockerfile installs dependencies from the wheelhouse, build it first.
+        if docker_config.builder == BUILDKIT:
+            wheelhouse = _get_python_context(event.config).get("wheelhouse")
+            if wheelhouse:
+                event.makefile.set_deps("docker-build", [wheelhouse])
+
+    @subscribe(medikit.on_end, writes=(".dockerignore", "docker.compose_file", "docker.build_file"))
     def on_end(self, event):
         docker_config = event.config["docker"]
 
@@ -241,5 +297,39 @@ class DockerFeature(Feature):
                 PUSH {{ '{{ .DOCKER_IMAGE }}:{{ .DOCKER_TAG }}' }}
             """,
             )
+        elif docker_config.builder == BUILDKIT:
+            self.render_file_inline(
+                docker_config.build_file,
+                """
+                # syntax=docker/dockerfile:1
+                FROM python:3 AS base
+                WORKDIR /app
+                RUN useradd --home-dir /app --user-group app \\
+                 && python -m venv /env
+                ENV PATH=/env/bin:$PATH
+
+                # Python dependencies, only depending on the requirements (without the package itself): this layer is
+                # rebuilt only if they change, and pip cache is kept from one build to another.
+                FROM base AS dependencies
+                COPY setup.py requirements*.txt /app/
+                RUN --mount=type=cache,target=/root/.cache/pip \\
+                {%- if wheelhouse %}
+                    --mount=type=bind,source={{ wheelhouse }},target=/wheelhouse \\
+                {%- endif %}
+                    sed -i '/^-e /d' requirements*.txt \\
+                 && pip install {% if wheelhouse %}--no-index --find-links=/wheelhouse {% endif %}-r {{ requirements_file }}
+
+                # Add everything else, code changes only rebuild from here.
+                FROM base
+                COPY --from=dependencies /env /env
+                COPY . /app
+                RUN --mount=type=cache,target=/root/.cache/pip \\
+                    pip install --no-deps . \\
+                 && chown app:app -R /app
+
+                USER app
+            """,
+                _get_python_context(event.config),
+            )
         elif docker_config.builder is not None:
             raise NotImplementedError("Unknown builder {}".format(docker_config.builder))
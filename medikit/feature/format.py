@@ -8,6 +8,7 @@ Superseeds "yapf" feature that was only using one tool for one language.
     $ make format
 
 """
+
 import functools
 import os
 
@@ -103,7 +104,7 @@ class FormatFeature(Feature):
             doc="Reformats the codebase (with " + ", ".join(sorted(config.active_tools)) + ").",
         )
 
-    @subscribe(medikit.on_start, priority=SUPPORT_PRIORITY)
+    @subscribe(medikit.on_start, priority=SUPPORT_PRIORITY, writes=("setup.cfg", ".style.yapf"))
     def on_start(self, event):
         config = self.get_config(event)  # type: FormatConfig
         if "isort" in config.active_tools:
@@ -4,10 +4,11 @@ Git version control system support.
 """
 
 import os
+import threading
 
 import medikit
 from medikit.events import subscribe
-from medikit.feature import ABSOLUTE_PRIORITY, Feature
+from medikit.feature import ABSOLUTE_PRIORITY, LAST_PRIORITY, Feature
 
 
 class GitConfig(Feature.Config):
@@ -28,6 +29,11 @@ class GitConfig(Feature.Config):
 class GitFeature(Feature):
     Config = GitConfig
 
+    def configure(self):
+        self.changed_files = []
+        # files are closed from worker threads when listeners are dispatched concurrently.
+        self._changed_files_lock = threading.Lock()
+
     @subscribe(medikit.on_start, priority=ABSOLUTE_PRIORITY)
     def on_start(self, event):
         if not event.config["git"].enabled:
@@ -40,11 +46,13 @@ class GitFeature(Feature):
             os.system('git commit --quiet -m "Project initialized using Medikit."')
 
         def on_file_change(event):
-            os.system("git add {}".format(event.filename))
+            with self._changed_files_lock:
+                if not event.filename in self.changed_files:
+                    self.changed_files.append(event.filename)
 
         self.dispatcher.add_listener("medikit.on_file_closed", on_file_change, priority=-1)
 
-    @subscribe(medikit.on_end)
+    @subscribe(medikit.on_end, writes=(".gitignore",))
     def on_end(self, event):
         self.render_file_inline(
             ".gitignore",
@@ -65,6 +73,28 @@ class GitFeature(Feature):
             event.variables,
         )
 
+    @subscribe(medikit.on_end, priority=LAST_PRIORITY)
+    def on_after_end(self, event):
+        """
+        Stages all the files that were changed during this run, using only one git call (and one index write).
+
+        """
+        if not event.config["git"].enabled or not self.changed_files:
+            return
+
+        from git import GitError, Repo
+
+        # not a work tree (for example, if git init failed), or git command failure.
+        try:
+            # sorted, as the order files were closed in depends on the worker threads.
+            Repo().git.add("--", *sorted(self.changed_files))
+        except GitError as exc:
+            self.dispatcher.info("git", "Could not stage changed files ({}).".format(exc))
+        else:
+            self.dispatcher.info("git", "Staged {} changed files.".format(len(self.changed_files)))
+
+        self.changed_files = []
+
     @subscribe("medikit.feature.make.on_generate", priority=ABSOLUTE_PRIORITY + 1)
     def on_make_generate(self, event):
         event.makefile["VERSION"] = "$(shell git describe 2>/dev/null || git rev-parse --short HEAD)"
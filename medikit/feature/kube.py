@@ -1,8 +1,13 @@
 """
 Setup make targets to rollout and rollback this project as a deployment onto a Kubernetes cluster.
 
+Patches (and rollbacks) of a variant can be applied concurrently (see :meth:`KubeConfig.set_concurrency`), using one
+hidden make target per resource run by a sub-make with a bounded number of jobs. The rollout can also wait for all the
+resources to be rolled out, checking their statuses at once (see :meth:`KubeConfig.enable_rollout_status`).
+
 """
 import json
+import re
 
 from medikit.events import subscribe
 from medikit.feature import Feature
@@ -14,6 +19,8 @@ class KubeConfig(Feature.Config):
         self._targets = dict()
         self._targets_patches = dict()
         self._use_helm = False
+        self._concurrency = 1
+        self._rollout_status = False
 
     def add_target(self, name, variant=None, *, patch, patch_path=""):
         if not variant in self._targets:
@@ -45,6 +52,52 @@ class KubeConfig(Feature.Config):
         self._use_helm = False
         return self
 
+    @property
+    def concurrency(self):
+        return self._concurrency
+
+    def set_concurrency(self, concurrency):
+        """
+        Set how many patches (or rollbacks) can be applied at once, 1 meaning one after the other. It can be overriden
+        when running make (``make kube-rollout KUBE_CONCURRENCY=8``).
+
+        :param int concurrency:
+        """
+        if int(concurrency) < 1:
+            raise ValueError("Kubernetes concurrency must be at least 1, got {!r}.".format(concurrency))
+        self._concurrency = int(concurrency)
+        return self
+
+    @property
+    def rollout_status(self):
+        return self._rollout_status
+
+    def enable_rollout_status(self):
+        """
+        Wait for all the patched resources to be rolled out (``kubectl rollout status``, all at once, for at most
+        ``KUBE_ROLLOUT_TIMEOUT``) after patching them.
+
+        """
+        self._rollout_status = True
+        return self
+
+    def disable_rollout_status(self):
+        self._rollout_status = False
+        return self
+
+
+def _add_subtargets(makefile, target, commands, *, jobs):
+    """
+    Add one hidden target per (resource, command) pair, and return the sub-make command line running all of them.
+
+    """
+    subtargets = []
+    for resource, command in commands:
+        subtarget = target + "/" + re.sub(r"[^\w./-]+", "-", resource)
+        makefile.add_target(subtarget, command, phony=True, hidden=True)
+        subtargets.append(subtarget)
+    return "$(MAKE) --no-print-directory -j{} {}".format(jobs, " ".join(subtargets))
+
 
 class KubeFeature(Feature):
     Config = KubeConfig
@@ -60,6 +113,12 @@ class KubeFeature(Feature):
         event.makefile["KUBECONFIG"] = ""
         event.makefile["KUBE_NAMESPACE"] = "default"
 
+        if kube_config.concurrency > 1:
+            event.makefile["KUBE_CONCURRENCY"] = str(kube_config.concurrency)
+
+        if kube_config.rollout_status:
+            event.makefile["KUBE_ROLLOUT_TIMEOUT"] = "5m"
+
         if kube_config.use_helm:
             event.makefile["HELM"] = which("helm")
             event.makefile["HELM_RELEASE"] = event.config.get_name()
@@ -70,7 +129,7 @@ class KubeFeature(Feature):
                 rollout_target = "-".join(filter(None, ("kube-rollout", variant)))
                 rollback_target = "-".join(filter(None, ("kube-rollback", variant)))
 
-                rollout_commands, rollback_commands = [], []
+                rollout_commands, rollback_commands, status_commands = [], [], []
                 for target, (patch_path, patch) in targets:
                     while patch_path:
                         try:
@@ -80,23 +139,52 @@ class KubeFeature(Feature):
                         patch = {_bit: patch}
 
                     rollout_commands.append(
-                        "$(KUBECTL) $(KUBECTL_OPTIONS) --namespace=$(KUBE_NAMESPACE) patch {target} -p{patch}".format(
-                            target=target, patch=repr(json.dumps(patch))
+                        (
+                            target,
+                            "$(KUBECTL) $(KUBECTL_OPTIONS) --namespace=$(KUBE_NAMESPACE) patch {target} -p{patch}".format(
+                                target=target, patch=repr(json.dumps(patch))
+                            ),
                         )
                     )
 
-                    rollback_commands.append("$(KUBECTL) rollout undo {target}".format(target=target))
+                    rollback_commands.append((target, "$(KUBECTL) rollout undo {target}".format(target=target)))
+
+                    status_commands.append(
+                        (
+                            target,
+                            "$(KUBECTL) $(KUBECTL_OPTIONS) --namespace=$(KUBE_NAMESPACE) rollout status {target} "
+                            "--timeout=$(KUBE_ROLLOUT_TIMEOUT)".format(target=target),
+                        )
+                    )
+
+                if kube_config.concurrency > 1:
+                    rollout_rule = [
+                        _add_subtargets(event.makefile, rollout_target, rollout_commands, jobs="$(KUBE_CONCURRENCY)")
+                    ]
+                    rollback_rule = [
+                        _add_subtargets(event.makefile, rollback_target, rollback_commands, jobs="$(KUBE_CONCURRENCY)")
+                    ]
+                else:
+                    rollout_rule = [command for target, command in rollout_commands]
+                    rollback_rule = [command for target, command in rollback_commands]
+
+                if kube_config.rollout_status:
+                    rollout_rule.append(
+                        _add_subtargets(
+                            event.makefile, rollout_target + "-status", status_commands, jobs=len(status_commands)
+                        )
+                    )
 
                 event.makefile.add_target(
                     rollout_target,
-                    "\n".join(rollout_commands),
+                    "\n".join(rollout_rule),
                     phony=True,
                     doc="Rollout docker image onto kubernetes cluster.",
                 )
 
                 event.makefile.add_target(
                     rollback_target,
-                    "\n".join(rollback_commands),
+                    "\n".join(rollback_rule),
                     phony=True,
                     doc="Rollbacks last kubernetes patch operation.",
                 )
@@ -25,6 +25,10 @@ __all__ = [
 ]
 
 
+# Independent targets that can run concurrently, using "make -j ci" (or MAKEFLAGS="-j8" make ci), if they are defined.
+CI_TARGETS = ("test", "format", "$(SPHINX_SOURCEDIR)", "docker-build")
+
+
 class MakeFeature(Feature):
     Config = MakeConfig
 
@@ -53,6 +57,17 @@ class MakeFeature(Feature):
             MakeConfig.on_generate, MakefileEvent(event.config.package_name, self.makefile, event.config)
         )
 
+        # projects may define their own ci target.
+        ci_targets = [target for target in CI_TARGETS if self.makefile.has_target(target)]
+        if ci_targets and not self.makefile.has_target("ci"):
+            self.makefile.add_target(
+                "ci",
+                "",
+                deps=ci_targets,
+                phony=True,
+                doc="Runs the tests, code formatting, documentation and docker builds (in parallel, with make -j).",
+            )
+
         if event.config["make"].include_medikit_targets:
             self.add_medikit_targets(event.config["make"])
 
@@ -72,8 +87,9 @@ class MakeFeature(Feature):
             doc="Shows available commands.",
         )
 
-        # Actual rendering of the Makefile
-        self.render_file_inline("Makefile", self.makefile.__str__(), override=True)
+        # Actual rendering of the Makefile (streamed, as the content is not a template).
+        with self.file("Makefile", override=True) as f:
+            self._log_file("Makefile", True, size=self.makefile.render(f))
 
     def add_medikit_targets(self, config):
         if not "PYTHON" in self.makefile:
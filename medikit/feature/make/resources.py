@@ -1,32 +1,47 @@
 import itertools
 import textwrap
-from collections import deque, namedtuple
+from collections import OrderedDict, namedtuple
 
 from medikit.structs import Script
 from medikit.utils import get_override_warning_banner
 
 MakefileTarget = namedtuple("MakefileTarget", ["deps", "rule", "doc"])
 
+# Install targets markers directory, an order-only prerequisite of the markers so that it exists before any of them runs.
+MARKERS_DIR = ".medikit"
+
+# Install commands are serialized using flock(1), if available, so that concurrent install targets (make -j) do not
+# run package managers (pip, yarn, ...) at the same time. The lock is taken on a file descriptor of the shell running
+# the install commands, and held until this shell exits.
+INSTALL_LOCK_VARIABLES = (
+    ("FLOCK", "$(firstword $(wildcard /usr/bin/flock /bin/flock /usr/local/bin/flock /opt/homebrew/bin/flock))"),
+    ("INSTALL_LOCK", "$(if $(FLOCK),exec 9>" + MARKERS_DIR + "/install.lock && $(FLOCK) 9 || exit 1;)"),
+)
+
 
 class Makefile(object):
+    """
+    Makefile model. Variables and targets are kept in ordered dicts, so that lookups, insertions (at either end) and
+    removals do not depend on the number of variables or targets already defined.
+
+    """
+
     @property
     def targets(self):
-        for key in self._target_order:
-            yield key, self._target_values[key]
+        yield from self._target_values.items()
 
     @property
     def environ(self):
         return self._env_values
 
     def __init__(self):
-        self._env_order, self._env_values, self._env_assignment_operators = deque(), {}, {}
-        self._target_order, self._target_values = deque(), {}
+        self._env_values, self._env_assignment_operators = OrderedDict(), {}
+        self._target_values = OrderedDict()
         self.hidden = set()
         self.phony = set()
         self.header = []
 
     def __delitem__(self, key):
-        self._env_order.remove(key)
         del self._env_values[key]
 
     def __contains__(self, item):
@@ -37,69 +52,96 @@ class Makefile(object):
 
     def __setitem__(self, key, value):
         self._env_values[key] = value
-        if not key in self._env_order:
-            self._env_order.append(key)
 
     def __iter__(self):
-        for key in self._env_order:
-            yield key, self._env_values[key]
+        yield from self._env_values.items()
 
     def __len__(self):
-        return len(self._env_order)
+        return len(self._env_values)
 
     def __str__(self):
-        content = [get_override_warning_banner(), ""] + self.header + [""]
+        return "\n".join(self.get_lines())
+
+    def get_lines(self):
+        yield from get_override_warning_banner().split("\n")
+        yield ""
+        yield from self.header
+        yield ""
 
         if len(self):
             for k, v in self:
                 v = textwrap.dedent(str(v)).strip()
                 v = v.replace("\n", " \\\n" + " " * (len(k) + 4))
-                content.append("{} {} {}".format(k, self._env_assignment_operators.get(k, "?="), v))
-            content.append("")
+                yield "{} {} {}".format(k, self._env_assignment_operators.get(k, "?="), v)
+            yield ""
 
         if len(self.phony):
-            content.append(".PHONY: " + " ".join(sorted(self.phony)))
-            content.append("")
+            yield ".PHONY: " + " ".join(sorted(self.phony))
+            yield ""
 
         for target, details in self.targets:
             deps, rule, doc = details
 
             if hasattr(rule, "render"):
-                content += list(rule.render(target, deps, doc))
+                yield from rule.render(target, deps, doc)
             else:
-                content.append(
-                    "{}: {}  {} {}".format(
-                        target,
-                        " ".join(deps),
-                        "#" if target in self.hidden else "##",
-                        doc.replace("\n", " ") if doc else "",
-                    ).strip()
-                )
+                yield "{}: {}  {} {}".format(
+                    target,
+                    " ".join(deps),
+                    "#" if target in self.hidden else "##",
+                    doc.replace("\n", " ") if doc else "",
+                ).strip()
 
                 script = textwrap.dedent(str(rule)).strip()
 
-                for line in script.split("\n"):
-                    content.append("\t" + line)
-
-            content.append("")
-
-        return "\n".join(content)
+                # a target without script (only prerequisites) gets no recipe
+                for line in script.split("\n") if script else ():
+                    yield "\t" + line
+
+            yield ""
+
+    def render(self, fp):
+        """
+        Write the makefile to a file-like object, line by line, without building the whole content in memory. Output is
+        the same as ``format_file_content(str(makefile))``: no leading or trailing blank lines, one final newline.
+
+        :return int: number of characters written.
+        """
+        size, pending = 0, []  # pending is the last non blank line, followed by blank lines
+        for line in self.get_lines():
+            if line.strip():
+                for pending_line in pending:
+                    size += fp.write(pending_line + "\n")
+                pending = [line]
+            elif pending:
+                # as textwrap.dedent does, whitespace only lines are written as empty lines.
+                pending.append("")
+        if pending:
+            size += fp.write(pending[0].rstrip() + "\n")
+        return size
 
     def keys(self):
-        return list(self._env_order)
+        return list(self._env_values)
 
     def add_target(self, target, rule, *, deps=None, phony=False, first=False, doc=None, hidden=False):
-        if target in self._target_order:
+        if target in self._target_values:
             raise RuntimeError("Duplicate definition for make target «{}».".format(target))
 
         if isinstance(rule, str):
             rule = Script(rule)
 
+        if isinstance(rule, InstallScript) and not self.has_target(MARKERS_DIR):
+            for key, value in INSTALL_LOCK_VARIABLES:
+                if not key in self:
+                    self[key] = value
+            self.add_target(MARKERS_DIR, "@mkdir -p $@", hidden=True)
+
         self._target_values[target] = MakefileTarget(
             deps=tuple(deps) if deps else tuple(), rule=rule, doc=textwrap.dedent(doc or "").strip()
         )
 
-        self._target_order.appendleft(target) if first else self._target_order.append(target)
+        if first:
+            self._target_values.move_to_end(target, last=False)
 
         if phony:
             self.phony.add(target)
@@ -149,9 +191,7 @@ class Makefile(object):
 
     def setleft(self, key, value):
         self._env_values[key] = value
-        if key in self._env_order:
-            self._env_order.remove(key)
-        self._env_order.appendleft(key)
+        self._env_values.move_to_end(key, last=False)
 
     def updateleft(self, *lst):
         for key, value in reversed(lst):
@@ -176,20 +216,45 @@ class InstallScript(Script):
             yield line
         yield "fi"
 
+    @staticmethod
+    def _lock(lines):
+        # The lock is held for the whole install, by running all the commands in one recipe line, hence one shell (make
+        # would run each recipe line in its own shell, releasing the lock in between). Each command is grouped, so that
+        # it stops the install on failure as its own recipe line would, "-" (ignore errors) becomes "|| true". The
+        # recipe is silent ("@") if all the commands were.
+        prefixes, commands = [], []
+        for line in lines:
+            prefix = line[: len(line) - len(line.lstrip("@-+"))]
+            command = "{{ {} ; }}".format(line[len(prefix) :])
+            prefixes.append(prefix)
+            commands.append(command + " || true" if "-" in prefix else command)
+        prefix = ("@" if all("@" in prefix for prefix in prefixes) else "") + (
+            "+" if any("+" in prefix for prefix in prefixes) else ""
+        )
+        yield prefix + "$(INSTALL_LOCK) \\"
+        for i, command in enumerate(commands):
+            yield "  " + command + (" && \\" if i < len(commands) - 1 else "")
+
     def render(self, name, deps, doc):
         tab = "\t"
-        yield "{name}: .medikit/{name} {deps}  ## {doc}".format(name=name, deps=" ".join(deps), doc=doc)
-        yield ".medikit/{name}: {deps}".format(name=name, deps=" ".join(sorted(set(self.deps))))
-        yield tab + "$(eval target := $(shell echo $@ | rev | cut -d/ -f1 | rev))"
+        yield "{name}: {markers}/{name} {deps}  ## {doc}".format(
+            name=name, markers=MARKERS_DIR, deps=" ".join(deps), doc=doc
+        )
+        yield "{markers}/{name}: {deps} | {markers}".format(
+            name=name, markers=MARKERS_DIR, deps=" ".join(sorted(set(self.deps)))
+        )
+        # target name is known at generation time, no need to compute it from $@ when running make.
         yield "ifeq ($(filter quick,$(MAKECMDGOALS)),quick)"
-        yield tab + r'@printf "Skipping \033[36m%s\033[0m because of \033[36mquick\033[0m target.\n" $(target)'
+        yield tab + r'@printf "Skipping \033[36m%s\033[0m because of \033[36mquick\033[0m target.\n" ' + name
         yield "else ifneq ($(QUICK),)"
-        yield tab + r'@printf "Skipping \033[36m%s\033[0m because \033[36m$$QUICK\033[0m is not empty.\n" $(target)'
+        yield tab + r'@printf "Skipping \033[36m%s\033[0m because \033[36m$$QUICK\033[0m is not empty.\n" ' + name
         yield "else"
-        yield tab + r'@printf "Applying \033[36m%s\033[0m target...\n" $(target)'
-        for line in itertools.chain(self.before_install, self.install, self.after_install):
-            yield tab + line
-        yield tab + "@mkdir -p .medikit; touch $@"
+        yield tab + r'@printf "Applying \033[36m%s\033[0m target...\n" ' + name
+        lines = list(itertools.chain(self.before_install, self.install, self.after_install))
+        if lines:
+            for line in self._lock(lines):
+                yield tab + line
+        yield tab + "@touch $@"
         yield "endif"
 
 
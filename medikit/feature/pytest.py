@@ -60,7 +60,7 @@ class PytestFeature(Feature):
             doc="Runs the test suite.",
         )
 
-    @subscribe(medikit.on_start, priority=SUPPORT_PRIORITY)
+    @subscribe(medikit.on_start, priority=SUPPORT_PRIORITY, writes=("tests/.gitkeep", ".coveragerc", ".travis.yml"))
     def on_start(self, event):
         tests_dir = "tests"
         if not os.path.exists(tests_dir):
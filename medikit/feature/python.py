@@ -31,26 +31,34 @@ Overview
 
 import itertools
 import os
-import tempfile
 from getpass import getuser
 
-from pip._vendor.distlib.util import parse_requirement
-from piptools._compat import parse_requirements
-from piptools.cache import DependencyCache
-from piptools.locations import CACHE_DIR
-from piptools.repositories import PyPIRepository
-from piptools.resolver import Resolver
-from piptools.utils import format_requirement
-
 import medikit
 from medikit.events import subscribe
 from medikit.feature import ABSOLUTE_PRIORITY, Feature
 from medikit.feature.make import InstallScript, which
 from medikit.globals import PIP_VERSION
+from medikit.resolver import RequirementsLock, RequirementsResolver
 from medikit.resources.configparser import ConfigParserResource
 from medikit.utils import get_override_warning_banner
 
 
+def _parse_requirement(req):
+    from pip._vendor.distlib.util import parse_requirement
+
+    return parse_requirement(req)
+
+
+def _get_wheelhouse(extra=None):
+    if extra:
+        return ".wheelhouse-" + extra
+    return ".wheelhouse"
+
+
+def _format_requirement(requirement, hashes=()):
+    return " \\\n".join((requirement, *("    --hash=" + h for h in hashes)))
+
+
 def _normalize_requirement(req):
     bits = req.requirement.split()
     if req.extras:
@@ -73,6 +81,10 @@ class PythonConfig(Feature.Config):
         self._create_packages = True
         self.override_requirements = False
         self.use_wheelhouse = False
+        self.resolver_workers = None
+        self.offline = False
+        self.upgrade_requirements = False
+        self.generate_hashes = False
 
     @property
     def package_dir(self):
@@ -188,7 +200,7 @@ class PythonConfig(Feature.Config):
             if extra not in self._constraints:
                 self._constraints[extra] = {}
         for req in reqs:
-            req = parse_requirement(req)
+            req = _parse_requirement(req)
             if req.name in self._constraints[extra]:
                 raise ValueError("Duplicate constraint for {}.".format(req.name))
             self._constraints[extra][req.name] = req
@@ -198,7 +210,7 @@ class PythonConfig(Feature.Config):
             if extra not in self._requirements:
                 self._requirements[extra] = {}
         for req in reqs:
-            req = parse_requirement(req)
+            req = _parse_requirement(req)
             if req.name in self._requirements[extra]:
                 raise ValueError("Duplicate requirement for {}.".format(req.name))
             self._requirements[extra][req.name] = req
@@ -287,12 +299,32 @@ class PythonFeature(Feature):
         event.makefile["PIP"] = "$(PYTHON) -m pip"
         event.makefile["PIP_INSTALL_OPTIONS"] = ""
 
-        if python_config.use_wheelhouse:
+        def _get_requirements_install_commands(extra=None, options=""):
+            if python_config.generate_hashes:
+                # Editable and inline requirements cannot be hashed, so they are installed once hashed pins are.
+                return [
+                    "$(PIP) install $(PIP_INSTALL_OPTIONS)"
+                    + options
+                    + " --require-hashes -r $("
+                    + _get_reqs_file_varname(extra=extra)
+                    + ")",
+                    "$(PIP) install $(PIP_INSTALL_OPTIONS)"
+                    + options
+                    + " -U $("
+                    + _get_reqs_inline_varname(extra=extra)
+                    + ') -e ".{}"'.format("[" + extra + "]" if extra else ""),
+                ]
+            return [
+                "$(PIP) install $(PIP_INSTALL_OPTIONS)"
+                + options
+                + " -U $("
+                + _get_reqs_inline_varname(extra=extra)
+                + ") -r $("
+                + _get_reqs_file_varname(extra=extra)
+                + ")"
+            ]
 
-            def _get_wheelhouse(extra=None):
-                if extra:
-                    return ".wheelhouse-" + extra
-                return ".wheelhouse"
+        if python_config.use_wheelhouse:
 
             def _get_wheelhouse_options(extra=None):
                 return "--no-index --find-links=" + _get_wheelhouse(extra=extra)
@@ -304,13 +336,9 @@ class PythonFeature(Feature):
                     + ' -U "pip '
                     + PIP_VERSION
                     + '" wheel',
-                    "$(PIP) install $(PIP_INSTALL_OPTIONS) "
-                    + _get_wheelhouse_options(extra=extra)
-                    + " -U $("
-                    + _get_reqs_inline_varname(extra=extra)
-                    + ") -r $("
-                    + _get_reqs_file_varname(extra=extra)
-                    + ")",
+                    *_get_requirements_install_commands(
+                        extra=extra, options=" " + _get_wheelhouse_options(extra=extra)
+                    ),
                 ]
 
             def _get_install_deps(extra=None):
@@ -347,11 +375,7 @@ class PythonFeature(Feature):
             def _get_install_commands(extra=None):
                 return [
                     '$(PIP) install $(PIP_INSTALL_OPTIONS) -U "pip ' + PIP_VERSION + '" wheel',
-                    "$(PIP) install $(PIP_INSTALL_OPTIONS) -U $("
-                    + _get_reqs_inline_varname(extra=extra)
-                    + ") -r $("
-                    + _get_reqs_file_varname(extra=extra)
-                    + ")",
+                    *_get_requirements_install_commands(extra=extra),
                 ]
 
             def _get_install_deps(extra=None):
@@ -443,46 +467,85 @@ class PythonFeature(Feature):
         # Our config object
         python_config = event.config["python"]
 
-        # Pip / PyPI
-        repository = PyPIRepository([], cache_dir=CACHE_DIR)
+        def _get_requirements_file(extra=None):
+            return "requirements{}.txt".format("-" + extra if extra else "")
+
+        extras = [
+            extra
+            for extra in itertools.chain((None,), python_config.get_extras())
+            if python_config.override_requirements or not os.path.exists(_get_requirements_file(extra))
+        ]
 
+        # Existing requirements files are kept as is, but still go through self.file() to be known as update outputs.
         for extra in itertools.chain((None,), python_config.get_extras()):
-            requirements_file = "requirements{}.txt".format("-" + extra if extra else "")
-
-            if python_config.override_requirements or not os.path.exists(requirements_file):
-                tmpfile = tempfile.NamedTemporaryFile(mode="wt", delete=False)
-                if extra:
-                    tmpfile.write("\n".join(python_config.get_requirements(extra=extra)))
-                else:
-                    tmpfile.write("\n".join(python_config.get_requirements()))
-                tmpfile.flush()
-                constraints = list(
-                    parse_requirements(
-                        tmpfile.name, finder=repository.finder, session=repository.session, options=repository.options
+            if not extra in extras:
+                with self.file(_get_requirements_file(extra)):
+                    pass
+
+        if not extras:
+            return
+
+        if python_config.generate_hashes:
+            vendors = [vendor for extra in (None, *extras) for vendor in python_config.get_vendors(extra=extra)]
+            if vendors:
+                raise ValueError(
+                    "Cannot generate hashes with vendored requirements ({}), pip would reject them in --require-hashes "
+                    "mode. Disable python.generate_hashes, or remove the vendored requirements.".format(
+                        ", ".join(vendors)
                     )
                 )
-                resolver = Resolver(
-                    constraints,
-                    repository,
-                    cache=DependencyCache(CACHE_DIR),
-                    prereleases=False,
-                    clear_caches=False,
-                    allow_unsafe=False,
-                )
 
-                self.render_file_inline(
-                    requirements_file,
-                    "\n".join(
-                        (
-                            "-e .{}".format("[" + extra + "]" if extra else ""),
-                            *(("-r requirements.txt",) if extra else ()),
-                            *python_config.get_vendors(extra=extra),
-                            *sorted(
-                                format_requirement(req)
-                                for req in resolver.resolve(max_rounds=10)
-                                if req.name != python_config.get("name")
-                            ),
-                        )
-                    ),
-                    override=python_config.override_requirements,
+        # Only extras which top-level requirements (or constraints) changed since the last resolution are resolved again.
+        lock = RequirementsLock()
+        if python_config.upgrade_requirements:
+            lock.clear()
+
+        # Base requirements are always resolved, as they are used to seed the extras resolution.
+        resolver = RequirementsResolver(
+            max_workers=python_config.resolver_workers,
+            metadata_cache_dir=self.cache_dir,
+            offline=python_config.offline,
+            wheelhouses=[_get_wheelhouse(extra) for extra in (None, *python_config.get_extras())],
+            generate_hashes=python_config.generate_hashes,
+            upgrade=python_config.upgrade_requirements,
+        )
+        resolutions = resolver.resolve(
+            {extra: list(python_config.get_requirements(extra=extra)) for extra in (None, *extras)},
+            extras,
+            lock=lock,
+            inputs={
+                extra: list(python_config.get_requirements(extra=extra, with_constraints=True))
+                for extra in (None, *extras)
+            },
+        )
+        if lock.write():
+            self.dispatcher.info("python", "Updated {}.".format(lock.filename))
+
+        for extra in extras:
+            resolution = resolutions[extra]
+            if resolution.locked:
+                self.dispatcher.info("python", "Using locked {}.".format(_get_requirements_file(extra)))
+            else:
+                self.dispatcher.info(
+                    "python", "Resolved {} in {:.2f}s.".format(_get_requirements_file(extra), resolution.duration)
                 )
+            self.render_file_inline(
+                _get_requirements_file(extra),
+                "\n".join(
+                    (
+                        *(
+                            ()
+                            if python_config.generate_hashes
+                            else ("-e .{}".format("[" + extra + "]" if extra else ""),)
+                        ),
+                        *(("-r requirements.txt",) if extra else ()),
+                        *python_config.get_vendors(extra=extra),
+                        *(
+                            _format_requirement(requirement, resolution.hashes.get(name, ()))
+                            for name, requirement in sorted(resolution.requirements.items(), key=lambda item: item[1])
+                            if name != python_config.get("name")
+                        ),
+                    )
+                ),
+                override=python_config.override_requirements,
+            )
@@ -1,5 +1,3 @@
-from pip._vendor.distlib.util import parse_requirement
-
 from medikit.events import subscribe
 
 from . import SUPPORT_PRIORITY, Feature
@@ -15,6 +13,8 @@ class SphinxConfig(Feature.Config):
 
         :param theme: Requirement for theme
         """
+        from pip._vendor.distlib.util import parse_requirement
+
         self._theme = parse_requirement(theme)
 
     def get_theme(self):
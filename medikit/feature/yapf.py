@@ -45,7 +45,7 @@ class YapfFeature(Feature):
             doc="Reformats the whole python codebase using yapf.",
         )
 
-    @subscribe(medikit.on_start, priority=SUPPORT_PRIORITY)
+    @subscribe(medikit.on_start, priority=SUPPORT_PRIORITY, writes=(".style.yapf",))
     def on_start(self, event):
         self.render_file(".style.yapf", "yapf/style.yapf.j2")
 
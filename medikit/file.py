@@ -1,11 +1,23 @@
 import contextlib
+import hashlib
+import io
 import os
 import stat
+import threading
+import weakref
+from collections import Counter, OrderedDict
 
 from whistle import Event
 
 ENCODING = "utf-8"
 
+WRITTEN = "written"
+UNCHANGED = "unchanged"
+
+_stats = weakref.WeakKeyDictionary()
+_rendered = weakref.WeakKeyDictionary()
+_lock = threading.RLock()
+
 
 class FileEvent(Event):
     def __init__(self, filename, executable, override):
@@ -15,25 +27,109 @@ class FileEvent(Event):
         self.override = override
 
 
+def get_file_stats(dispatcher):
+    """
+    Counters of files written and left unchanged (because their content did not change) through a given dispatcher.
+
+    :param EventDispatcher dispatcher:
+    :return Counter:
+    """
+    with _lock:
+        if not dispatcher in _stats:
+            _stats[dispatcher] = Counter()
+        return _stats[dispatcher]
+
+
+def get_rendered_files(dispatcher):
+    """
+    Names of the files rendered through a given dispatcher (whether they were written or left unchanged), or skipped
+    because they already exist and must not be overriden.
+
+    :param EventDispatcher dispatcher:
+    :return list:
+    """
+    with _lock:
+        return list(_rendered.get(dispatcher, ()))
+
+
+def _add_rendered(dispatcher, filename):
+    with _lock:
+        _rendered.setdefault(dispatcher, OrderedDict())[filename] = True
+
+
+def _count(dispatcher, stat_name):
+    with _lock:
+        get_file_stats(dispatcher)[stat_name] += 1
+
+
+def _hash_file(filename, chunk_size=65536):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def is_unchanged(filename, content):
+    """
+    Checks whether a file on disk already contains exactly the given content (bytes).
+
+    """
+    try:
+        if os.stat(filename).st_size != len(content):
+            return False
+        return _hash_file(filename) == hashlib.sha256(content).digest()
+    except FileNotFoundError:
+        return False
+
+
+def _make_executable(filename):
+    st = os.stat(filename)
+    if not st.st_mode & stat.S_IEXEC:
+        os.chmod(filename, st.st_mode | stat.S_IEXEC)
+
+
 @contextlib.contextmanager
 def File(dispatcher, name, *, executable=False, override=False):
+    """
+    Renders a file into memory, and only writes it (and dispatches the file events) if the content actually changed.
+    Unchanged files are not touched, so their mtime is preserved.
+
+    "medikit.on_file_opened" is dispatched once the rendered content is known to differ from the file, with an
+    in-memory buffer as ``event.file``: what listeners write there is written before the rendered content.
+
+    """
     event = FileEvent(name, executable, override)
 
     if event.override or not os.path.exists(event.filename):
-        with open(event.filename, "w+", encoding=ENCODING) as f:
-            event.file = f
+        buffer = io.StringIO()
+        yield buffer
+        content = buffer.getvalue()
+
+        _add_rendered(dispatcher, event.filename)
+        if not is_unchanged(event.filename, content.encode(ENCODING)):
+            event.file = io.StringIO()
             event = dispatcher.dispatch("medikit.on_file_opened", event)
-            yield f
+            content = event.file.getvalue() + content
             event.file = None
 
+        if is_unchanged(event.filename, content.encode(ENCODING)):
+            _count(dispatcher, UNCHANGED)
+            if event.executable:
+                _make_executable(event.filename)
+            return
+
+        with open(event.filename, "w+", encoding=ENCODING) as f:
+            f.write(content)
+        _count(dispatcher, WRITTEN)
+
         if event.executable and os.path.exists(event.filename):
-            st = os.stat(event.filename)
-            os.chmod(event.filename, st.st_mode | stat.S_IEXEC)
+            _make_executable(event.filename)
 
         dispatcher.dispatch("medikit.on_file_closed", event)
     else:
-        with open("/dev/null", "w", encoding=ENCODING) as f:
-            yield f
+        _add_rendered(dispatcher, event.filename)
+        yield io.StringIO()
 
 
 @contextlib.contextmanager
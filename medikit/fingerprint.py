@@ -0,0 +1,100 @@
+"""
+Fingerprint of the inputs of an update (Projectfile, medikit version, templates, features and the versions of their
+distributions, variables) and of its outputs (generated files, including the ones that are only created if missing),
+so that an update can be skipped when nothing changed since the last run.
+
+"""
+import hashlib
+import json
+import os
+
+import medikit
+
+FINGERPRINT_FILE = ".medikit/fingerprint.json"
+
+_templates_hash = None
+
+
+def _hash_templates():
+    global _templates_hash
+    if _templates_hash is None:
+        h = hashlib.sha256()
+        root = os.path.join(os.path.dirname(medikit.__file__), "feature", "template")
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                h.update(os.path.relpath(path, root).encode("utf-8"))
+                with open(path, "rb") as f:
+                    h.update(f.read())
+        _templates_hash = h.hexdigest()
+    return _templates_hash
+
+
+def get_inputs_fingerprint(config_filename, *, features, variables):
+    """
+    Hash of everything an update depends on.
+
+    :param str config_filename: path to the Projectfile
+    :param set features: enabled features
+    :param dict variables: resolved variables
+    :return str:
+    """
+    from medikit.config.loader import get_feature_versions
+
+    h = hashlib.sha256()
+    with open(config_filename, "rb") as f:
+        h.update(f.read())
+    h.update(
+        json.dumps(
+            {
+                "version": medikit.__version__,
+                "templates": _hash_templates(),
+                "features": get_feature_versions(sorted(features)),
+                "variables": variables,
+            },
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+    )
+    return h.hexdigest()
+
+
+def get_outputs_state(filenames):
+    """
+    State (size and modification time) of the generated files, used to detect manual changes or removals.
+
+    """
+    state = {}
+    for filename in sorted(set(filenames)):
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            state[filename] = None
+        else:
+            state[filename] = [st.st_size, st.st_mtime_ns]
+    return state
+
+
+def is_up_to_date(fingerprint_file, inputs):
+    try:
+        with open(fingerprint_file) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    if previous.get("inputs") != inputs:
+        return False
+
+    # missing outputs (removed, or never created) are always stale.
+    outputs = previous.get("outputs") or {}
+    state = get_outputs_state(outputs.keys())
+    return all(value is not None for value in state.values()) and state == outputs
+
+
+def write_fingerprint(fingerprint_file, inputs, outputs):
+    dirname = os.path.dirname(fingerprint_file)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(fingerprint_file, "w+") as f:
+        json.dump({"inputs": inputs, "outputs": get_outputs_state(outputs)}, f, indent=4, sort_keys=True)
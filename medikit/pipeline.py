@@ -1,10 +1,19 @@
 """
 Pipelines are a way to describe a simple step-by-step process, for example the release process.
 
+By default, each step depends on all the steps before it, but steps can declare which steps they depend on (``after=...``),
+making the pipeline a DAG: steps which dependencies are complete can then run concurrently.
+
 """
 import datetime
+import glob
+import hashlib
 import json
 import logging
+import os
+import tempfile
+
+from medikit.fingerprint import get_outputs_state
 
 logger = logging.getLogger(__name__)
 
@@ -21,19 +30,36 @@ class Pipeline:
 
     def __init__(self):
         self.steps = []
+        self.dependencies = {}
+
+    def _check_identity(self, identity):
+        if not any(identity == get_identity(step) for step in self.steps):
+            raise ValueError(
+                'Step with identity {!r} not found. Try "show" subcommand to list identities.'.format(identity)
+            )
+
+    def add(self, step, *, before=None, after=None):
+        """
+        Add a step to the pipeline.
+
+        :param Step step:
+        :param str before: identity of the step to insert this step before (defaults to the end of the pipeline).
+        :param str|iterable after: identity (or identities) of the steps this step depends on (defaults to all the
+            steps before it, an empty iterable meaning that the step does not depend on any other).
+        """
+        if after is not None:
+            after = [after] if isinstance(after, str) else list(after)
+            for identity in after:
+                self._check_identity(identity)
+            self.dependencies[get_identity(step)] = after
 
-    def add(self, step, *, before=None):
         if before:
-            insert_at = None
-            for i, _step in enumerate(self.steps):
-                if before == get_identity(_step):
-                    insert_at = i
-                    break
-            if not insert_at:
+            insert_at = next((i for i, _step in enumerate(self.steps) if before == get_identity(_step)), None)
+            if insert_at is None:
                 raise ValueError(
                     'Step with identity {!r} not found. Try "show" subcommand to list identities.'.format(before)
                 )
-            self.steps = self.steps[:insert_at] + [step] + self.steps[insert_at:]
+            self.steps.insert(insert_at, step)
         else:
             self.steps.append(step)
         return self
@@ -42,8 +68,20 @@ class Pipeline:
         for i in range(len(self.steps)):
             if identity == get_identity(self.steps[i]):
                 del self.steps[i]
+                self.dependencies.pop(identity, None)
                 break
 
+    def get_dependencies(self, step):
+        """
+        Identities of the steps a step depends on.
+
+        :return list:
+        """
+        identity = get_identity(step)
+        if identity in self.dependencies:
+            return self.dependencies[identity]
+        return [get_identity(_step) for _step in self.steps[: self.steps.index(step)]]
+
     def __iter__(self):
         yield from self.steps
 
@@ -56,6 +94,7 @@ class ConfiguredPipeline:
     def __init__(self, name, pipeline, config=None):
         self.name = name
         self.steps = pipeline.steps
+        self.dependencies = {get_identity(step): pipeline.get_dependencies(step) for step in pipeline.steps}
         self.meta = {"created": str(datetime.datetime.now())}
         self.config = config
 
@@ -70,11 +109,32 @@ class ConfiguredPipeline:
             step.init()
 
     def next(self):
-        for step in self.steps:
-            if not step.complete:
-                return step
+        for step in self.get_ready_steps():
+            return step
+        if any(not step.complete for step in self.steps):
+            raise RuntimeError("No step can run, check the pipeline steps dependencies for cycles.")
         raise StopIteration("No step left.")
 
+    def get_ready_steps(self):
+        """
+        Incomplete steps which dependencies are all complete, in pipeline order.
+
+        :return list:
+        """
+        identities = {get_identity(step) for step in self.steps}
+        complete = {get_identity(step) for step in self.steps if step.complete}
+        return [
+            step
+            for step in self.steps
+            if not step.complete
+            and all(
+                identity in complete or identity not in identities for identity in self.dependencies[get_identity(step)]
+            )
+        ]
+
+    def get_position(self, step):
+        return self.steps.index(step) + 1
+
     @property
     def current(self):
         for i, step in enumerate(self.steps):
@@ -106,3 +166,96 @@ class ConfiguredPipeline:
                 raise IOError("Mismatch on step identity.")
             step.set_state(state)
             step.config = self.config
+
+
+def _expand(patterns):
+    """
+    Filenames matching a number of glob patterns. Patterns without wildcards are kept even if the file does not exist.
+
+    """
+    filenames = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        if matches:
+            filenames.update(matches)
+        elif glob.escape(pattern) == pattern:
+            filenames.add(pattern)
+    return sorted(filenames)
+
+
+def get_inputs_hash(step):
+    """
+    Hash of a step identity and of the content of its input files.
+
+    :return str:
+    """
+    h = hashlib.sha256(get_identity(step).encode("utf-8"))
+    for filename in _expand(step.inputs):
+        h.update(b"\0" + filename.encode("utf-8") + b"\0")
+        try:
+            with open(filename, "rb") as f:
+                h.update(f.read())
+        except FileNotFoundError:
+            h.update(b"\0missing")
+    return h.hexdigest()
+
+
+class StepCache:
+    """
+    Inputs hash and outputs state of the pipeline steps that declared inputs or outputs, as of their last successful
+    run. It is stored aside of the pipeline state, so that it survives restarts (``start --force``), and cleared once
+    the pipeline completes or is aborted (the next run starts from scratch).
+
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        try:
+            with open(filename) as f:
+                self.steps = json.load(f).get("steps", {})
+        except (OSError, ValueError):
+            self.steps = {}
+        self.changed = False
+
+    def is_valid(self, step):
+        """
+        Whether a step can be skipped, because its inputs did not change and its outputs were not touched since its
+        last successful run.
+
+        :return bool:
+        """
+        if not (step.inputs or step.outputs):
+            return False
+        entry = self.steps.get(get_identity(step))
+        if not entry or entry["inputs"] != get_inputs_hash(step):
+            return False
+        outputs = entry["outputs"]
+        if sorted(outputs) != _expand(step.outputs):
+            return False
+        return all(outputs.values()) and get_outputs_state(outputs) == outputs
+
+    def set(self, step):
+        if step.inputs or step.outputs:
+            self.steps[get_identity(step)] = {
+                "inputs": get_inputs_hash(step),
+                "outputs": get_outputs_state(_expand(step.outputs)),
+            }
+            self.changed = True
+
+    def write(self):
+        if not self.changed:
+            return False
+        dirname = os.path.dirname(self.filename) or "."
+        fd, tmpname = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"steps": self.steps}, f, indent=4, sort_keys=True)
+        os.replace(tmpname, self.filename)
+        self.changed = False
+        return True
+
+    def clear(self):
+        self.steps, self.changed = {}, False
+        try:
+            os.unlink(self.filename)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,549 @@
+"""
+Requirements resolution engine, used by the python feature to freeze requirements*.txt files.
+
+The base requirements are resolved first, then each extra is resolved, seeded with the base pins so that shared
+dependencies are not looked up again (and stay consistent across files). Extras do not depend on each other, so they
+are resolved concurrently, each one in its own worker process (pip internals are not thread safe).
+
+Packages metadata (available versions, and dependencies of each version) is cached by medikit, so that a warm cache
+resolution does not need any index round-trip. In offline mode, only this cache and local wheelhouses are used.
+
+Resolutions are recorded in a lock file, along with the top-level requirements they were resolved from, so that only the
+extras which top-level requirements changed are resolved again (seeded with their previous pins).
+
+"""
+
+import email.parser
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from medikit.cache import get_cache, hash_key
+
+Resolution = namedtuple("Resolution", ["extra", "requirements", "duration", "hashes", "locked"])
+
+LOCK_FILE = ".medikit/requirements.lock.json"
+
+SDIST_EXTENSIONS = (".tar.gz", ".tar.bz2", ".zip")
+
+
+def canonicalize_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def get_requirement_name(line):
+    return canonicalize_name(re.match(r"[A-Za-z0-9._-]*", line.strip()).group(0))
+
+
+def parse_distribution_filename(filename):
+    """
+    Get project name and version from a wheel or source distribution filename.
+
+    :return tuple|NoneType: (canonical name, version), or None if this is not a distribution.
+    """
+    if filename.endswith(".whl"):
+        bits = filename[:-4].split("-")
+        return (canonicalize_name(bits[0]), bits[1]) if len(bits) >= 5 else None
+    for extension in SDIST_EXTENSIONS:
+        if filename.endswith(extension):
+            name, _, version = filename[: -len(extension)].rpartition("-")
+            return (canonicalize_name(name), version) if name else None
+    return None
+
+
+def read_wheel_requirements(filename, extras=()):
+    """
+    Dependencies of a wheel (from its metadata) that apply to the current environment and given extras, without
+    markers.
+
+    :return list: requirement strings.
+    """
+    from packaging.requirements import Requirement
+
+    with zipfile.ZipFile(filename) as archive:
+        name = next(name for name in archive.namelist() if name.endswith(".dist-info/METADATA"))
+        metadata = email.parser.HeaderParser().parsestr(archive.read(name).decode("utf-8"))
+
+    requirements = []
+    for line in metadata.get_all("Requires-Dist") or ():
+        requirement = Requirement(line)
+        if requirement.marker is not None:
+            if not any(requirement.marker.evaluate({"extra": extra}) for extra in ("", *extras)):
+                continue
+            requirement.marker = None
+        requirements.append(str(requirement))
+    return sorted(requirements)
+
+
+class MetadataCache:
+    """
+    Versions available for each project, and dependencies of each project version, keyed by index URLs (stored in the
+    medikit cache). Available versions are considered stale after ``max_age`` seconds, or if they were cached before
+    ``refresh_before`` (a timestamp, used to look them up again when upgrading), unless working offline. When working
+    offline, local wheelhouses are also looked up.
+
+    """
+
+    def __init__(
+        self, cache_dir, *, index_urls, offline=False, wheelhouses=(), max_age=24 * 3600, refresh_before=None
+    ):
+        self.cache = get_cache("requirements", cache_dir=cache_dir, max_size=64 * 1024 * 1024)
+        self.index_key = hash_key(*index_urls)
+        self.offline = offline
+        self.wheelhouses = wheelhouses
+        self.max_age = max_age
+        self.refresh_before = refresh_before
+
+    def _get(self, *key):
+        value = self.cache.get(hash_key(self.index_key, *key))
+        return None if value is None else json.loads(value)
+
+    def _set(self, value, *key):
+        self.cache.set(hash_key(self.index_key, *key), json.dumps(value))
+
+    def get_distributions(self, name):
+        """
+        :return dict: version -> list of distribution files, from the local wheelhouses (only when offline).
+        """
+        distributions = {}
+        if self.offline:
+            for wheelhouse in self.wheelhouses:
+                if os.path.isdir(wheelhouse):
+                    for entry in sorted(os.listdir(wheelhouse)):
+                        parsed = parse_distribution_filename(entry)
+                        if parsed and parsed[0] == canonicalize_name(name):
+                            distributions.setdefault(parsed[1], []).append(os.path.join(wheelhouse, entry))
+        return distributions
+
+    def get_versions(self, name):
+        """
+        :return list|NoneType: known versions, or None if unknown (or stale).
+        """
+        cached = self._get("versions", canonicalize_name(name))
+        if cached is not None and not self.offline:
+            if time.time() - cached["time"] > self.max_age or cached["time"] < (self.refresh_before or 0):
+                cached = None
+
+        versions = set(cached["versions"]) if cached else set()
+        versions.update(self.get_distributions(name))
+        return sorted(versions) if (cached or versions) else None
+
+    def set_versions(self, name, versions):
+        self._set({"time": time.time(), "versions": sorted(versions)}, "versions", canonicalize_name(name))
+
+    def get_dependencies(self, name, version, extras=()):
+        """
+        :return list|NoneType: dependencies, as requirement strings, or None if unknown.
+        """
+        dependencies = self._get("dependencies", canonicalize_name(name), version, *sorted(extras))
+        if dependencies is None:
+            for filename in self.get_distributions(name).get(version, ()):
+                if filename.endswith(".whl"):
+                    return read_wheel_requirements(filename, extras)
+        return dependencies
+
+    def set_dependencies(self, name, version, extras, dependencies):
+        self._set(sorted(dependencies), "dependencies", canonicalize_name(name), version, *sorted(extras))
+
+    def get_hashes(self, name, version):
+        """
+        :return list|NoneType: hashes of the distribution files ("algorithm:hexdigest"), or None if unknown.
+        """
+        hashes = self._get("hashes", canonicalize_name(name), version)
+        if hashes is None:
+            filenames = self.get_distributions(name).get(version)
+            if filenames:
+                hashes = sorted("sha256:" + _hash_file(filename) for filename in filenames)
+        return hashes
+
+    def set_hashes(self, name, version, hashes):
+        self._set(sorted(hashes), "hashes", canonicalize_name(name), version)
+
+
+def _hash_file(filename, chunk_size=65536):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _create_cached_repository(repository, metadata):
+    from packaging.version import parse as parse_version
+    from piptools._compat import install_req_from_line
+    from piptools.repositories.base import BaseRepository
+    from piptools.utils import is_url_requirement, key_from_ireq, make_install_requirement
+
+    class CachedRepository(BaseRepository):
+        """
+        Proxy to a pip-tools repository, answering from the metadata cache when possible, and only from the metadata
+        cache (and local wheelhouses) when offline.
+
+        """
+
+        def __init__(self, repository, metadata):
+            self.repository = repository
+            self.metadata = metadata
+
+        @property
+        def options(self):
+            return self.repository.options
+
+        @property
+        def finder(self):
+            return self.repository.finder
+
+        @property
+        def session(self):
+            return self.repository.session
+
+        @property
+        def DEFAULT_INDEX_URL(self):
+            return self.repository.DEFAULT_INDEX_URL
+
+        def clear_caches(self):
+            self.repository.clear_caches()
+
+        def freshen_build_caches(self):
+            self.repository.freshen_build_caches()
+
+        def find_best_match(self, ireq, prereleases=None):
+            if ireq.editable or is_url_requirement(ireq):
+                return self.repository.find_best_match(ireq, prereleases)
+
+            versions, cached = self.metadata.get_versions(ireq.name), True
+            if versions is None:
+                if self.metadata.offline:
+                    raise RuntimeError("No version of {} is known, cannot resolve it offline.".format(ireq.name))
+                versions, cached = self._find_versions(ireq.name), False
+
+            matching = list(ireq.specifier.filter(versions, prereleases=prereleases))
+            if not matching and cached and not self.metadata.offline:
+                # the matching version may have been released since the versions were cached.
+                versions = self._find_versions(ireq.name)
+                matching = list(ireq.specifier.filter(versions, prereleases=prereleases))
+            if not matching:
+                raise RuntimeError(
+                    "No version of {} matches {} (known versions: {}).".format(
+                        ireq.name, ireq.specifier or "*", ", ".join(versions) or "none"
+                    )
+                )
+            version = max(matching, key=parse_version)
+            return make_install_requirement(key_from_ireq(ireq), version, ireq.extras, constraint=ireq.constraint)
+
+        def _find_versions(self, name):
+            candidates = self.repository.find_all_candidates(name)
+            versions = sorted({str(candidate.version) for candidate in candidates})
+            self.metadata.set_versions(name, versions)
+            return versions
+
+        def get_dependencies(self, ireq):
+            if ireq.editable or is_url_requirement(ireq):
+                return self.repository.get_dependencies(ireq)
+
+            name, version, extras = key_from_ireq(ireq), next(iter(ireq.specifier)).version, sorted(ireq.extras)
+            dependencies = self.metadata.get_dependencies(name, version, extras)
+            if dependencies is None:
+                if self.metadata.offline:
+                    raise RuntimeError(
+                        "Dependencies of {}=={} are not known, cannot resolve them offline.".format(name, version)
+                    )
+                dependencies = sorted(str(dependency.req) for dependency in self.repository.get_dependencies(ireq))
+                self.metadata.set_dependencies(name, version, extras, dependencies)
+            return {install_req_from_line(line, constraint=ireq.constraint) for line in dependencies}
+
+        def get_hashes(self, ireq):
+            if ireq.editable or is_url_requirement(ireq):
+                return self.repository.get_hashes(ireq)
+
+            name, version = key_from_ireq(ireq), next(iter(ireq.specifier)).version
+            hashes = self.metadata.get_hashes(name, version)
+            if hashes is None:
+                if self.metadata.offline:
+                    raise RuntimeError("Hashes of {}=={} are not known, cannot get them offline.".format(name, version))
+                hashes = sorted(self.repository.get_hashes(ireq))
+                self.metadata.set_hashes(name, version, hashes)
+            return set(hashes)
+
+        def allow_all_wheels(self):
+            return self.repository.allow_all_wheels()
+
+    return CachedRepository(repository, metadata)
+
+
+def _create_dependency_cache(cache_dir):
+    from piptools.cache import DependencyCache
+
+    class AtomicDependencyCache(DependencyCache):
+        """
+        Dependency cache that is safe to share between processes: the cache file is written to a temporary file then
+        renamed, so a concurrent reader never sees a partial document.
+
+        """
+
+        def write_cache(self):
+            doc = {"__format__": 1, "dependencies": self._cache}
+            fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(self._cache_file), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(doc, f, sort_keys=True)
+            os.replace(tmpname, self._cache_file)
+
+    return AtomicDependencyCache(cache_dir)
+
+
+def resolve_requirements(
+    requirements,
+    *,
+    cache_dir,
+    seed=None,
+    max_rounds=10,
+    metadata_cache_dir=None,
+    offline=False,
+    wheelhouses=(),
+    generate_hashes=False,
+    refresh_before=None
+):
+    """
+    Resolve a list of requirement lines into a set of pins. Runs in a worker process, so takes and returns plain
+    (picklable) values only.
+
+    :param list requirements: requirement lines, as written in a requirements file.
+    :param str cache_dir: pip-tools cache directory.
+    :param list seed: pinned requirement lines to prefer, when they satisfy the constraints.
+    :param int max_rounds:
+    :param str metadata_cache_dir: medikit cache directory, to cache packages metadata in (None to disable).
+    :param bool offline: only use the metadata cache and local wheelhouses.
+    :param list wheelhouses: local wheelhouse directories (only used offline).
+    :param bool generate_hashes: also find the hashes of the pinned distributions.
+    :param float refresh_before: timestamp before which cached available versions are looked up again.
+    :return tuple: (requirement name -> pinned requirement line, requirement name -> sorted hashes)
+    """
+    from piptools._compat import install_req_from_line, parse_requirements
+    from piptools.repositories import LocalRequirementsRepository, PyPIRepository
+    from piptools.resolver import Resolver
+    from piptools.utils import format_requirement, key_from_ireq
+
+    repository = PyPIRepository([], cache_dir=cache_dir)
+    if metadata_cache_dir is not None or offline:
+        metadata = MetadataCache(
+            metadata_cache_dir,
+            index_urls=repository.finder.index_urls,
+            offline=offline,
+            wheelhouses=wheelhouses,
+            refresh_before=refresh_before,
+        )
+        repository = _create_cached_repository(repository, metadata)
+    if seed:
+        existing_pins = {}
+        for line in seed:
+            ireq = install_req_from_line(line)
+            existing_pins[key_from_ireq(ireq)] = ireq
+        repository = LocalRequirementsRepository(existing_pins, repository)
+
+    with tempfile.NamedTemporaryFile(mode="wt", suffix=".txt") as tmpfile:
+        tmpfile.write("\n".join(requirements))
+        tmpfile.flush()
+        constraints = list(
+            parse_requirements(
+                tmpfile.name, finder=repository.finder, session=repository.session, options=repository.options
+            )
+        )
+
+    resolver = Resolver(
+        constraints,
+        repository,
+        cache=_create_dependency_cache(cache_dir),
+        prereleases=False,
+        clear_caches=False,
+        allow_unsafe=False,
+    )
+
+    results = resolver.resolve(max_rounds=max_rounds)
+    pins = {req.name: format_requirement(req) for req in results}
+    hashes = {}
+    if generate_hashes:
+        hashes = {ireq.name: sorted(ireq_hashes) for ireq, ireq_hashes in resolver.resolve_hashes(results).items()}
+    return pins, hashes
+
+
+def _timed(func, extra, requirements, **kwargs):
+    started_at = time.perf_counter()
+    pins, hashes = func(requirements, **kwargs)
+    return Resolution(extra, pins, time.perf_counter() - started_at, hashes, False)
+
+
+class RequirementsLock:
+    """
+    Lock file, storing for each extra (the empty string being the base requirements) the top-level requirements, and
+    what they were resolved to (pins, and hashes if they were generated).
+
+    """
+
+    def __init__(self, filename=LOCK_FILE):
+        self.filename = filename
+        self.changed = False
+        try:
+            with open(filename) as f:
+                document = json.load(f)
+        except (OSError, ValueError):
+            document = {}
+        self.extras = document.get("extras", {}) if document.get("__format__") == 1 else {}
+
+    def clear(self):
+        self.changed = self.changed or bool(self.extras)
+        self.extras = {}
+
+    def get(self, extra, inputs, *, hashes=False, base=None):
+        """
+        Locked resolution of an extra, if it is still valid for the given top-level requirements (and base pins, that
+        the extra pins must agree with), or None. Hashes are only part of the locked resolution if they are required.
+
+        :return Resolution|NoneType:
+        """
+        entry = self.extras.get(extra or "")
+        if not entry or entry["inputs"] != sorted(inputs):
+            return None
+        if hashes and set(entry["hashes"]) != set(entry["requirements"]):
+            return None
+        for name, pin in (base or {}).items():
+            if entry["requirements"].get(name, pin) != pin:
+                return None
+        return Resolution(extra, entry["requirements"], 0.0, entry["hashes"] if hashes else {}, True)
+
+    def get_pins(self, extra):
+        """
+        Previously resolved pins of an extra, even if outdated (used as a seed for a new resolution).
+
+        :return list:
+        """
+        entry = self.extras.get(extra or "")
+        return sorted(entry["requirements"].values()) if entry else []
+
+    def set(self, resolution, inputs):
+        entry = {
+            "inputs": sorted(inputs),
+            "requirements": dict(sorted(resolution.requirements.items())),
+            "hashes": dict(sorted(resolution.hashes.items())),
+        }
+        if self.extras.get(resolution.extra or "") != entry:
+            self.extras[resolution.extra or ""] = entry
+            self.changed = True
+
+    def write(self):
+        if not self.changed:
+            return False
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        fd, tmpname = tempfile.mkstemp(dir=dirname or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"__format__": 1, "extras": self.extras}, f, indent=4, sort_keys=True)
+        os.replace(tmpname, self.filename)
+        self.changed = False
+        return True
+
+
+class RequirementsResolver:
+    """
+    Resolves the base requirements once, then all the given extras (concurrently, if more than one worker is allowed),
+    using the base resolution as a seed. If a lock is given, still valid locked resolutions are used as is, and other
+    resolutions are seeded with the previously locked pins. When upgrading, cached available versions are looked up
+    again (once per resolver).
+
+    """
+
+    def __init__(
+        self,
+        *,
+        cache_dir=None,
+        max_workers=None,
+        max_rounds=10,
+        metadata_cache_dir=None,
+        offline=False,
+        wheelhouses=(),
+        generate_hashes=False,
+        upgrade=False,
+        resolve=resolve_requirements
+    ):
+        if cache_dir is None:
+            from piptools.locations import CACHE_DIR as cache_dir
+
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_rounds = max_rounds
+        self.metadata_cache_dir = metadata_cache_dir
+        self.offline = offline
+        self.wheelhouses = list(wheelhouses)
+        self.generate_hashes = generate_hashes
+        self.refresh_before = time.time() if upgrade else None
+        self._resolve = resolve
+
+    def resolve(self, requirements, extras=(), *, lock=None, inputs=None):
+        """
+        :param dict requirements: extra (or None for base requirements) -> list of requirement lines.
+        :param iterable extras: extras to resolve (base requirements are always resolved).
+        :param RequirementsLock lock: lock to read still valid resolutions from, and to record new resolutions into.
+        :param dict inputs: extra -> top-level requirements a locked resolution must match to be used (defaults to the
+            requirements to resolve).
+        :return dict: extra (or None) -> Resolution
+        """
+        inputs = inputs or requirements
+        options = {
+            "cache_dir": self.cache_dir,
+            "max_rounds": self.max_rounds,
+            "metadata_cache_dir": self.metadata_cache_dir,
+            "offline": self.offline,
+            "wheelhouses": self.wheelhouses,
+            "generate_hashes": self.generate_hashes,
+            "refresh_before": self.refresh_before,
+        }
+
+        base = lock.get(None, inputs[None], hashes=self.generate_hashes) if lock else None
+        if base is None:
+            base = _timed(
+                self._resolve, None, requirements[None], seed=(lock.get_pins(None) if lock else None) or None, **options
+            )
+        results = {None: base}
+
+        seeds = {}
+        for extra in extras:
+            if extra is not None:
+                locked = (
+                    lock.get(extra, inputs[extra], hashes=self.generate_hashes, base=base.requirements)
+                    if lock
+                    else None
+                )
+                if locked:
+                    results[extra] = locked
+                else:
+                    # base pins first, so that shared dependencies stay consistent across files.
+                    previous = lock.get_pins(extra) if lock else ()
+                    seeds[extra] = sorted(
+                        {get_requirement_name(line): line for line in (*previous, *base.requirements.values())}.values()
+                    )
+
+        if len(seeds) > 1 and self.max_workers != 1:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(_timed, self._resolve, extra, requirements[extra], seed=seed, **options)
+                    for extra, seed in seeds.items()
+                ]
+                for future in futures:
+                    resolution = future.result()
+                    results[resolution.extra] = resolution
+        else:
+            for extra, seed in seeds.items():
+                results[extra] = _timed(self._resolve, extra, requirements[extra], seed=seed, **options)
+
+        if lock:
+            for extra, resolution in results.items():
+                if not resolution.locked:
+                    lock.set(resolution, inputs[extra])
+
+        return results
@@ -1,25 +1,163 @@
-import configparser
 import os
+import re
+import threading
+
+ENCODING = "utf-8"
+
+SECTION_RE = re.compile(r"^\[(?P<name>[^\]]+)\]")
+COMMENT_PREFIXES = ("#", ";")
+OPTION_RE = re.compile(r"^(?P<key>[^=:\s#;][^=:]*?)\s*[=:]\s*(?P<value>.*)$")
 
 
 class AbstractResource:
+    def __init__(self):
+        # resources are shared between features, using them as context managers serializes changes.
+        self._lock = threading.RLock()
+
     def __enter__(self):
+        self._lock.acquire()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        self._lock.release()
+
+
+def _is_continuation(line):
+    return line[:1].isspace() and line.strip() != ""
+
+
+def _is_comment(line):
+    return line.strip().startswith(COMMENT_PREFIXES)
+
+
+def _format_option(key, value):
+    # same format as configparser.ConfigParser.write()
+    return "{} = {}\n".format(key, str(value).replace("\n", "\n\t"))
+
+
+class IniDocument:
+    """
+    Round-trip representation of an INI file, as a list of lines. Only the options that are set are changed, everything
+    else (comments, ordering, formatting of other options) is kept as is.
+
+    """
+
+    def __init__(self, content=""):
+        self.lines = content.splitlines(keepends=True)
 
+    def __str__(self):
+        return "".join(self.lines)
 
-def _set_values(c, values):
-    for k, v in values.items():
-        if not k in c:
-            c[k] = {}
-        for kk, vv in v.items():
-            c[k][kk] = vv
+    def _get_sections(self):
+        """
+        :return dict: section name -> (start, end) line indexes, start being the header line.
+        """
+        sections, current = {}, None
+        for i, line in enumerate(self.lines):
+            match = SECTION_RE.match(line)
+            if match:
+                if current is not None:
+                    sections[current] = (sections[current][0], i)
+                current = match.group("name").strip()
+                sections[current] = (i, len(self.lines))
+        return sections
+
+    def _get_options(self, start, end):
+        """
+        :return dict: lowercased option name -> (start, end, value), for the section spanning the given lines. An option
+            spans up to its last value line, so that the comments following it are not part of it.
+        """
+        options, i = {}, start + 1
+        while i < end:
+            match = OPTION_RE.match(self.lines[i].rstrip("\r\n"))
+            if not match:
+                i += 1
+                continue
+
+            values, j, last = [match.group("value").strip()], i + 1, i + 1
+            while j < end and (_is_continuation(self.lines[j]) or not self.lines[j].strip()):
+                if _is_continuation(self.lines[j]) and not _is_comment(self.lines[j]):
+                    values.append(self.lines[j].strip())
+                    last = j + 1
+                j += 1
+            options[match.group("key").strip().lower()] = (i, last, "\n".join(values).strip())
+            i = last
+        return options
+
+    def _append(self, *lines):
+        if self.lines and not self.lines[-1].endswith("\n"):
+            self.lines[-1] += "\n"
+        self.lines.extend(lines)
+
+    def has_section(self, section):
+        return section in self._get_sections()
+
+    def add_section(self, section):
+        if not self.has_section(section):
+            if self.lines and self.lines[-1].strip():
+                self._append("\n")
+            self._append("[{}]\n".format(section), "\n")
+
+    def get(self, section, key, default=None):
+        sections = self._get_sections()
+        if not section in sections:
+            return default
+        option = self._get_options(*sections[section]).get(key.lower())
+        return default if option is None else option[2]
+
+    def set(self, section, key, value):
+        """
+        Set an option value, adding the section and/or the option if needed.
+
+        :return bool: whether the document changed.
+        """
+        self.add_section(section)
+        start, end = self._get_sections()[section]
+        option = self._get_options(start, end).get(key.lower())
+
+        lines = _format_option(key, value).splitlines(keepends=True)
+        if option is not None:
+            if option[2] == IniDocument("[_]\n" + "".join(lines)).get("_", key):
+                return False
+            # comments between the value lines are kept, after the new value.
+            comments = [line for line in self.lines[option[0] + 1 : option[1]] if _is_comment(line)]
+            self.lines[option[0] : option[1]] = lines + comments
+            return True
+
+        # add the option after the last non-empty line of the section
+        while end - 1 > start and not self.lines[end - 1].strip():
+            end -= 1
+        if not self.lines[end - 1].endswith("\n"):
+            self.lines[end - 1] += "\n"
+        self.lines[end:end] = lines
+        return True
+
+    def update(self, values):
+        """
+        Set a number of options, from a dict of sections, each one being a dict of options.
+
+        :return bool: whether the document changed.
+        """
+        changed = False
+        for section, options in values.items():
+            if not self.has_section(section):
+                self.add_section(section)
+                changed = True
+            for key, value in options.items():
+                changed = self.set(section, key, value) or changed
+        return changed
 
 
 class ConfigParserResource(AbstractResource):
+    """
+    INI file (setup.cfg, tox.ini, .coveragerc, ...) with values that are only set when the file is created (initial
+    values) and values that are always enforced (managed values). Existing files are modified in place and only
+    written if a managed value actually changed.
+
+    """
+
     def __init__(self):
+        super().__init__()
         self.initial_values = []
         self.managed_values = []
 
@@ -30,17 +168,24 @@ class ConfigParserResource(AbstractResource):
         self.managed_values.append(values)
 
     def write(self, event, target):
-        config = configparser.ConfigParser()
+        """
+        :return bool: whether the file was written.
+        """
         exists = os.path.exists(target)
         if exists:
-            config.read(target)
+            with open(target, encoding=ENCODING) as f:
+                document = IniDocument(f.read())
         else:
             # only apply to new files
+            document = IniDocument()
             for initial_value in self.initial_values:
-                _set_values(config, initial_value)
+                document.update(initial_value)
 
+        changed = not exists
         for managed_value in self.managed_values:
-            _set_values(config, managed_value)
+            changed = document.update(managed_value) or changed
 
-        with open(target, "w+") as f:
-            config.write(f)
+        if changed:
+            with open(target, "w+", encoding=ENCODING) as f:
+                f.write(str(document))
+        return changed
@@ -3,3 +3,5 @@ DEFAULT_FEATURES = {"git", "make"}
 DEFAULT_FILES = {"requirements", "requirements-dev", "classifiers", "version"}
 
 YAPF_STYLE_CONFIG = "pep8"
+
+CACHE_DIR = ".medikit/cache"
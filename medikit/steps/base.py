@@ -2,10 +2,16 @@ import shlex
 import subprocess
 from logging import getLogger
 
+from medikit.steps.utils.git import TIMEOUT, format_errors, run_on_remotes
 from medikit.utils import run_command
 
 
 class Step:
+    # Files (or glob patterns) the step depends on, and produces. Steps declaring them are skipped when their inputs did
+    # not change and their outputs are still there, untouched, since their last successful run.
+    inputs = ()
+    outputs = ()
+
     @property
     def logger(self):
         try:
@@ -21,6 +27,18 @@ class Step:
     def set_complete(self, value=True):
         self._state["complete"] = bool(value)
 
+    @property
+    def cached(self):
+        return self._state.get("cached", False)
+
+    def set_cached(self):
+        """
+        Mark the step complete, without running it, as its outputs from a previous run are still valid.
+
+        """
+        self._state["cached"] = True
+        self.set_complete()
+
     def __init__(self):
         self._state = {}
         self.__args__ = ()
@@ -46,3 +64,21 @@ class Step:
 
     def exec(self, command):
         return run_command(command, logger=self.logger)
+
+    def exec_on_remotes(self, name, get_args, remotes, *, timeout=TIMEOUT):
+        """
+        Run a git command against a number of remotes, concurrently. Remotes that succeeded are remembered in the step
+        state, so that running the step again (`medikit pipeline ... continue`) only retries the failed ones.
+
+        :param str name: state key (for example, "pushed").
+        :param callable get_args: called with a remote name, returns the git arguments for this remote.
+        :param list remotes: remote names
+        :param float timeout: per remote timeout, in seconds, or None to wait for git to finish.
+        """
+        done = self._state.setdefault(name, {})
+        pending = [remote for remote in remotes if not done.get(remote)]
+        errors = run_on_remotes(get_args, pending, timeout=timeout, logger=self.logger)
+        for remote in pending:
+            done[remote] = remote not in errors
+        if errors:
+            raise RuntimeError(format_errors("git " + " ".join(get_args("<remote>")), errors))
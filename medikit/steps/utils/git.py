@@ -0,0 +1,79 @@
+"""
+Runs git commands against a number of remotes concurrently (fetches, pushes), so that slow remotes do not serialize a
+release. Each command can have its own timeout, disabled by default as a large push can legitimately be slow (and never
+waits for credentials on a terminal).
+
+"""
+
+import os
+import signal
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Default per remote timeout, in seconds (None waits for git to finish). Steps take a timeout=... argument to override it.
+TIMEOUT = None
+
+
+def run_on_remotes(get_args, remotes, *, timeout=TIMEOUT, cwd=None, logger=None):
+    """
+    Run a git command for each remote, concurrently.
+
+    :param callable get_args: called with a remote name, returns the git arguments for this remote.
+    :param list remotes: remote names
+    :param float timeout: per remote timeout, in seconds, or None to wait for git to finish.
+    :return dict: remote name -> error message, for the remotes that failed (empty if all succeeded).
+    """
+    # never wait for credentials on a terminal
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+    def run(remote):
+        args = ["git", *get_args(remote)]
+        if logger:
+            logger.info("{}...".format(" ".join(args)))
+        # in its own session, so that a timeout kills the children too (ssh, credential helpers, ...).
+        with subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            env=env,
+            start_new_session=True,
+        ) as process:
+            try:
+                output, _ = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                if hasattr(os, "killpg"):
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+                process.communicate()
+                return "timed out after {}s, git was killed and may not have completed (use a larger timeout, or timeout=None, in the step configuration).".format(
+                    timeout
+                )
+        if process.returncode:
+            output = output.decode("utf-8", errors="replace").strip()
+            return output or "exited with status {}.".format(process.returncode)
+
+    if not remotes:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(remotes)) as executor:
+        results = dict(zip(remotes, executor.map(run, remotes)))
+    return {remote: error for remote, error in results.items() if error}
+
+
+def format_errors(action, errors):
+    """
+    Aggregate the errors of a number of remotes in one message.
+
+    :param str action: what failed (for example, "git push").
+    :param dict errors: remote name -> error message
+    :return str:
+    """
+    return "\n".join(
+        (
+            "{} failed for {} remote(s):".format(action, len(errors)),
+            *("  {}: {}".format(remote, errors[remote].replace("\n", "\n    ")) for remote in sorted(errors)),
+        )
+    )
@@ -1,78 +1,161 @@
-# This is stolen from honcho, probably needs refactoring / simplification for our usage.
-import datetime
+"""
+Runs shell commands, streaming their output as it comes (using asyncio subprocesses, so no relay process or thread is
+needed). Output is read in chunks and written by batches of complete lines.
+
+"""
+
+import asyncio
+import contextlib
 import os
 import signal
 import subprocess
 import sys
-from collections import namedtuple
+import threading
 
-Message = namedtuple("Message", "type data time name colour")
+ON_WINDOWS = "win32" in str(sys.platform).lower()
 
+# before python 3.8, subprocesses can only be run from the main thread.
+LEGACY_CHILD_WATCHER = not ON_WINDOWS and sys.version_info < (3, 8)
 
-class Process(object):
-    def __init__(self, cmd, name=None, colour=None, quiet=False, env=None, cwd=None):
-        self.cmd = cmd
-        self.colour = colour
-        self.quiet = quiet
-        self.name = name
-        self.env = os.environ.copy() if env is None else env
-        self.cwd = cwd
+CHUNK_SIZE = 65536
 
-        self._child = None
-        self._child_ctor = Popen
+FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP")
 
-    def run(self, events=None, ignore_signals=False):
-        self._events = events
-        self._child = self._child_ctor(self.cmd, env=self.env, cwd=self.cwd)
-        self._send_message({"pid": self._child.pid}, type="start")
+# processes currently running, in any thread (see forward_signals()).
+_running = set()
+_running_lock = threading.Lock()
 
-        # Don't pay attention to SIGINT/SIGTERM. The process itself is
-        # considered unkillable, and will only exit when its child (the shell
-        # running the Procfile process) exits.
-        if ignore_signals:
-            signal.signal(signal.SIGINT, signal.SIG_IGN)
-            signal.signal(signal.SIGTERM, signal.SIG_IGN)
 
-        for line in iter(self._child.stdout.readline, b""):
-            if not self.quiet:
-                self._send_message(line)
-        self._child.stdout.close()
-        self._child.wait()
+def _get_forwarded_signals():
+    if ON_WINDOWS:
+        return []
+    return [getattr(signal, name) for name in FORWARDED_SIGNALS]
 
-        self._send_message({"returncode": self._child.returncode}, type="stop")
 
-    def _send_message(self, data, type="line"):
-        if self._events is not None:
-            self._events.put(
-                Message(type=type, data=data, time=datetime.datetime.now(), name=self.name, colour=self.colour)
-            )
+@contextlib.contextmanager
+def forward_signals():
+    """
+    Forward the signals received by medikit (SIGINT, SIGTERM, SIGHUP) to all the running processes, including the ones
+    run from other threads (which cannot install signal handlers themselves). Must be used from the main thread.
 
+    """
+    signums = _get_forwarded_signals()
 
-ON_WINDOWS = "win32" in str(sys.platform).lower()
+    def forward(signum, frame):
+        with _running_lock:
+            processes = list(_running)
+        for process in processes:
+            process.send_signal(signum)
+
+    previous = {signum: signal.signal(signum, forward) for signum in signums}
+    try:
+        yield
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
 
 
-class Popen(subprocess.Popen):
-    def __init__(self, cmd, **kwargs):
-        start_new_session = kwargs.pop("start_new_session", True)
-        options = {
-            "stdout": subprocess.PIPE,
-            "stderr": subprocess.STDOUT,
-            "shell": True,
-            "bufsize": 1,
-            "close_fds": not ON_WINDOWS,
-        }
-        options.update(**kwargs)
+class Process(object):
+    """
+    A shell command, run in its own session (or process group, on windows). Signals received by medikit while the
+    command runs (SIGINT, SIGTERM, SIGHUP) are forwarded to the whole command process group (when run from another
+    thread than the main one, only within a :func:`forward_signals` block).
+
+    :param str cmd: shell command
+    :param callable on_start: called with the process id once the command started.
+    :param callable on_output: called with batches of complete output lines (str, newlines included).
+    """
 
+    def __init__(self, cmd, *, on_start=None, on_output=None, env=None, cwd=None, chunk_size=CHUNK_SIZE):
+        self.cmd = cmd
+        self.env = os.environ.copy() if env is None else env
+        self.cwd = cwd
+        self.on_start = on_start
+        self.on_output = on_output
+        self.chunk_size = chunk_size
+
+        self.pid = None
+        self.returncode = None
+
+    def run(self):
+        """
+        Run the command until it exits.
+
+        :return int: the command return code (negative if it was killed by a signal, on posix).
+        """
+        loop = asyncio.new_event_loop()
+        # Before python 3.8, the child watcher only works with a loop of the main thread, and needs to be attached to
+        # it explicitly (it only attaches itself to the loop set with set_event_loop()).
+        watcher = None
+        if LEGACY_CHILD_WATCHER and threading.current_thread() is threading.main_thread():
+            watcher = asyncio.get_child_watcher()
+            watcher.attach_loop(loop)
+        try:
+            return loop.run_until_complete(self._run(loop))
+        finally:
+            if watcher:
+                watcher.attach_loop(None)
+            loop.close()
+
+    def send_signal(self, signum):
+        if self.pid is not None and self.returncode is None:
+            try:
+                if ON_WINDOWS:
+                    os.kill(self.pid, signum)
+                else:
+                    os.killpg(self.pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _get_options(self):
         if ON_WINDOWS:
             # MSDN reference:
             #   http://msdn.microsoft.com/en-us/library/windows/desktop/ms684863%28v=vs.85%29.aspx
             create_new_process_group = 0x00000200
-            detached_process = 0x00000008
-            options.update(creationflags=detached_process | create_new_process_group)
-        elif start_new_session:
-            if sys.version_info < (3, 2):
-                options.update(preexec_fn=os.setsid)
-            else:
-                options.update(start_new_session=True)
-
-        super(Popen, self).__init__(cmd, **options)
+            return {"creationflags": create_new_process_group}
+        return {"start_new_session": True}
+
+    async def _run(self, loop):
+        child = await asyncio.create_subprocess_shell(
+            self.cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=self.env,
+            cwd=self.cwd,
+            **self._get_options(),
+        )
+        self.pid = child.pid
+        if self.on_start:
+            self.on_start(child.pid)
+
+        # signal handlers can only be installed from the main thread (and not on windows).
+        signums = []
+        if threading.current_thread() is threading.main_thread():
+            signums = _get_forwarded_signals()
+        for signum in signums:
+            loop.add_signal_handler(signum, self.send_signal, signum)
+        with _running_lock:
+            _running.add(self)
+        try:
+            await self._read_output(child.stdout)
+            self.returncode = await child.wait()
+        finally:
+            with _running_lock:
+                _running.discard(self)
+            for signum in signums:
+                loop.remove_signal_handler(signum)
+
+        return self.returncode
+
+    async def _read_output(self, stream):
+        pending = b""
+        while True:
+            chunk = await stream.read(self.chunk_size)
+            if not chunk:
+                break
+            lines, newline, pending = (pending + chunk).rpartition(b"\n")
+            if newline and self.on_output:
+                self.on_output((lines + b"\n").decode("utf-8", errors="replace"))
+        if pending and self.on_output:
+            self.on_output(pending.decode("utf-8", errors="replace") + "\n")
@@ -1,10 +1,9 @@
 import os
 
-from git import Repo
-from git_semver import get_current_version
 from semantic_version import Version
 
 from medikit.steps import Step
+from medikit.steps.utils.git import TIMEOUT
 
 
 class PythonVersion(Version):
@@ -23,6 +22,10 @@ class PythonVersion(Version):
 
 
 class BumpVersion(Step):
+    def __init__(self, *, timeout=TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
     def get_name(self):
         try:
             # TODO see if we can ignore this, left here for BC
@@ -41,10 +44,13 @@ class BumpVersion(Step):
         if not os.path.exists(version_file):
             raise FileNotFoundError("Cannot find version file for {} (searched in {!r}).".format(name, version_file))
 
+        from git import Repo
+        from git_semver import get_current_version
+
         repo = Repo()
-        for remote in repo.remotes:
-            self.logger.info("git fetch {}...".format(remote))
-            remote.fetch(tags=True)
+        self.exec_on_remotes(
+            "fetched", lambda remote: ["fetch", "--tags", remote], list(map(str, repo.remotes)), timeout=self.timeout
+        )
 
         git_version = get_current_version(repo, Version=PythonVersion)
         if git_version:
@@ -17,6 +17,7 @@ class FeatureTestCase(TestCase):
         dispatcher = dispatcher or self.create_dispatcher()
         feature = (feature_type or self.feature_type)(dispatcher)
         feature.file_type = NullFile
+        feature.cache_dir = None
         return feature, dispatcher
 
     def create_config(self):
@@ -62,7 +62,6 @@ setup(
         "pip >= 19, < 20",
         "pip-tools ~= 4.5.0",
         "semantic_version < 2.7",
-        "stevedore ~= 3.0",
         "whistle ~= 1.0",
         "yapf ~= 0.20",
     ],
@@ -1,4 +1,8 @@
+import contextlib
+import io
+
 import medikit
+from medikit.events import ProjectEvent
 from medikit.feature.docker import DockerFeature
 from medikit.feature.make import Makefile, MakefileEvent
 from medikit.testing import FeatureTestCase
@@ -51,3 +55,39 @@ class TestDockerFeature(FeatureTestCase):
         feature.on_make_generate(event)
 
         assert event.makefile.environ["DOCKER_IMAGE"] == "example.com/acme/three"
+
+    def test_buildkit_builder(self):
+        feature, dispatcher = self.create_feature()
+
+        files = {}
+
+        @contextlib.contextmanager
+        def file_type(dispatcher, name, *, executable=False, override=False):
+            files[name] = io.StringIO()
+            yield files[name]
+
+        feature.file_type = file_type
+
+        config = self.create_config()
+        config.require("python")
+        config["docker"].use_buildkit_builder()
+        config["python"].use_wheelhouse = True
+        config["python"].add_requirements(prod=["gunicorn"])
+
+        event = MakefileEvent(PACKAGE_NAME, Makefile(), config)
+        feature.on_make_generate(event)
+
+        assert event.makefile.environ["DOCKER_BUILD_FILE"] == "Dockerfile"
+        assert "--cache-from=$(DOCKER_CACHE_FROM)" in event.makefile.environ["DOCKER_BUILD_OPTIONS"]
+        assert "--cache-to=$(DOCKER_CACHE_TO)" in event.makefile.environ["DOCKER_BUILD_OPTIONS"]
+        assert str(event.makefile.get_target("docker-build")).startswith("DOCKER_BUILDKIT=$(DOCKER_BUILDKIT) ")
+        assert dict(event.makefile.targets)["docker-build"][0] == [".wheelhouse-prod"]
+
+        feature.on_end(ProjectEvent(config=config, setup={"name": PACKAGE_NAME}))
+        dockerfile = files["Dockerfile"].getvalue()
+
+        # dependencies are installed before the code is added, from the wheelhouse, with a pip cache
+        assert dockerfile.index("COPY setup.py requirements*.txt /app/") < dockerfile.index("COPY . /app")
+        assert "RUN --mount=type=cache,target=/root/.cache/pip \\\n" in dockerfile
+        assert "--mount=type=bind,source=.wheelhouse-prod,target=/wheelhouse" in dockerfile
+        assert "pip install --no-index --find-links=/wheelhouse -r requirements-prod.txt" in dockerfile
@@ -1,9 +1,10 @@
+import tempfile
+import threading
 from unittest.mock import patch
 
-import pytest
-
 import medikit
 from medikit.events import ProjectEvent
+from medikit.file import FileEvent
 from medikit.feature.git import GitFeature
 from medikit.testing import FeatureTestCase
 
@@ -49,7 +50,54 @@ class TestGitFeature(FeatureTestCase):
         with patch("medikit.file.FileEvent") as fe, patch("os.system", side_effect=commands.append) as os_system:
             feature.on_end(ProjectEvent(config=self.create_config(), setup={"name": PACKAGE_NAME}))
 
-    # TODO
-    @pytest.mark.skip()
     def test_on_file_change(self):
-        self.fail()
+        feature, dispatcher = self.create_feature()
+        config = self.create_config()
+
+        with patch("os.path.exists", return_value=True):
+            feature.on_start(ProjectEvent(config=config))
+
+        for filename in ("Makefile", "setup.py", "my file.txt", "Makefile"):
+            dispatcher.dispatch("medikit.on_file_closed", FileEvent(filename, False, True))
+
+        with patch("git.Repo") as repo:
+            feature.on_after_end(ProjectEvent(config=config))
+            repo.return_value.git.add.assert_called_once_with("--", "Makefile", "my file.txt", "setup.py")
+
+        # nothing changed, nothing to stage
+        with patch("git.Repo") as repo:
+            feature.on_after_end(ProjectEvent(config=config))
+            repo.assert_not_called()
+
+    def test_on_file_change_from_worker_threads(self):
+        feature, dispatcher = self.create_feature()
+        config = self.create_config()
+
+        with patch("os.path.exists", return_value=True):
+            feature.on_start(ProjectEvent(config=config))
+
+        def close_files():
+            for filename in ("setup.py", "Makefile") * 100:
+                dispatcher.dispatch("medikit.on_file_closed", FileEvent(filename, False, True))
+
+        threads = [threading.Thread(target=close_files) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with patch("git.Repo") as repo:
+            feature.on_after_end(ProjectEvent(config=config))
+            repo.return_value.git.add.assert_called_once_with("--", "Makefile", "setup.py")
+
+    def test_on_file_change_outside_of_a_repository(self):
+        feature, dispatcher = self.create_feature()
+        config = self.create_config()
+
+        with patch("os.path.exists", return_value=True):
+            feature.on_start(ProjectEvent(config=config))
+        dispatcher.dispatch("medikit.on_file_closed", FileEvent("Makefile", False, True))
+
+        with tempfile.TemporaryDirectory() as path, patch("os.getcwd", return_value=path):
+            feature.on_after_end(ProjectEvent(config=config))
+        assert feature.changed_files == []
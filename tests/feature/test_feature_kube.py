@@ -0,0 +1,94 @@
+import os
+import subprocess
+import tempfile
+import time
+
+from medikit.feature.kube import KubeFeature
+from medikit.feature.make import Makefile, MakefileEvent
+from medikit.testing import FeatureTestCase
+
+PACKAGE_NAME = "bar"
+
+# Stands in for the cluster: logs its arguments, taking some time to do so.
+FAKE_KUBECTL = """#!/bin/sh
+sleep 0.5
+echo "$@" >> "$(dirname "$0")/kubectl.log"
+"""
+
+
+class TestKubeFeature(FeatureTestCase):
+    feature_type = KubeFeature
+    required_features = {"make", "docker", "kube"}
+
+    def generate(self, setup):
+        feature, dispatcher = self.create_feature()
+        config = self.create_config()
+        setup(config["kube"])
+        event = MakefileEvent(PACKAGE_NAME, Makefile(), config)
+        feature.on_make_generate(event)
+        return event.makefile
+
+    def add_targets(self, kube, variant=None, count=4):
+        for i in range(count):
+            kube.add_target("deployment/app{}".format(i), variant, patch={"image": "app:1.0"}, patch_path="spec")
+
+    def run_make(self, tmpdir, makefile, target):
+        with open(os.path.join(tmpdir, "kubectl"), "w") as f:
+            f.write(FAKE_KUBECTL)
+        os.chmod(os.path.join(tmpdir, "kubectl"), 0o755)
+        makefile["KUBECTL"] = os.path.join(tmpdir, "kubectl")
+        with open(os.path.join(tmpdir, "Makefile"), "w") as f:
+            makefile.render(f)
+
+        started_at = time.monotonic()
+        subprocess.run(["make", "-s", "-C", tmpdir, target], check=True, stdout=subprocess.DEVNULL)
+        duration = time.monotonic() - started_at
+
+        with open(os.path.join(tmpdir, "kubectl.log")) as f:
+            return sorted(f.read().splitlines()), duration
+
+    def test_serial_by_default(self):
+        makefile = self.generate(self.add_targets)
+
+        rule = str(makefile.get_target("kube-rollout")).strip().split("\n")
+        assert len(rule) == 4
+        assert rule[0] == (
+            "$(KUBECTL) $(KUBECTL_OPTIONS) --namespace=$(KUBE_NAMESPACE) patch deployment/app0 "
+            '-p\'{"spec": {"image": "app:1.0"}}\''
+        )
+        assert not "KUBE_CONCURRENCY" in makefile
+        assert [target for target, _ in makefile.targets] == ["kube-rollout", "kube-rollback"]
+
+    def test_concurrent_rollout(self):
+        makefile = self.generate(lambda kube: self.add_targets(kube.set_concurrency(4).enable_rollout_status()))
+
+        assert makefile["KUBE_CONCURRENCY"] == "4"
+        assert str(makefile.get_target("kube-rollout")).strip().split("\n") == [
+            "$(MAKE) --no-print-directory -j$(KUBE_CONCURRENCY) "
+            + " ".join("kube-rollout/deployment/app{}".format(i) for i in range(4)),
+            "$(MAKE) --no-print-directory -j4 "
+            + " ".join("kube-rollout-status/deployment/app{}".format(i) for i in range(4)),
+        ]
+        assert "kube-rollback/deployment/app3" in makefile.hidden
+
+        with self.subTest("rollout"), tempfile.TemporaryDirectory() as tmpdir:
+            log, duration = self.run_make(tmpdir, makefile, "kube-rollout")
+            assert log == sorted(
+                [
+                    *(
+                        '--namespace=default patch deployment/app{} -p{{"spec": {{"image": "app:1.0"}}}}'.format(i)
+                        for i in range(4)
+                    ),
+                    *("--namespace=default rollout status deployment/app{} --timeout=5m".format(i) for i in range(4)),
+                ]
+            )
+            # 8 calls of 0.5s, in two concurrent waves
+            assert duration < 3
+
+        with self.subTest("rollback"), tempfile.TemporaryDirectory() as tmpdir:
+            log, duration = self.run_make(tmpdir, makefile, "kube-rollback")
+            assert log == ["rollout undo deployment/app{}".format(i) for i in range(4)]
+
+    def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            self.generate(lambda kube: kube.set_concurrency(0))
@@ -0,0 +1,153 @@
+import io
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from medikit.events import ProjectEvent
+from medikit.feature.make import MakeConfig, MakeFeature, Makefile
+from medikit.testing import FeatureTestCase
+
+
+def test_makefile_variables_order():
+    makefile = Makefile()
+    makefile["B"] = "b"
+    makefile["C"] = "c"
+    makefile["B"] = "bb"  # redefining does not change the order
+    makefile.setleft("A", "a")
+    makefile.updateleft(("Y", "y"), ("C", "cc"))
+    del makefile["Y"]
+
+    assert makefile.keys() == ["C", "A", "B"]
+    assert list(makefile) == [("C", "cc"), ("A", "a"), ("B", "bb")]
+    assert len(makefile) == 3
+    assert "A" in makefile and not "Y" in makefile
+
+
+def test_makefile_targets_order():
+    makefile = Makefile()
+    makefile.add_target("foo", "echo foo")
+    makefile.add_target("bar", "echo bar", first=True)
+    makefile.add_target("baz", "echo baz")
+
+    assert [target for target, details in makefile.targets] == ["bar", "foo", "baz"]
+    assert makefile.has_target("foo")
+
+    with pytest.raises(RuntimeError):
+        makefile.add_target("foo", "echo foo")
+
+
+def _create_makefile():
+    makefile = Makefile()
+    makefile["PACKAGE"] = "foo"
+    makefile["PYTHON_REQUIREMENTS"] = "\n-r requirements.txt\n-r requirements-dev.txt\n"
+    makefile.header.append("include foo.mk")
+    makefile.add_install_target()
+    makefile.add_install_target("dev")
+    makefile.add_target("test", "pytest tests\n  ", deps=("install-dev",), phony=True, doc="Runs tests.")
+    return makefile
+
+
+def test_makefile_render():
+    from jinja2 import Template
+
+    from medikit.utils import format_file_content
+
+    makefile = _create_makefile()
+    fp = io.StringIO()
+    size = makefile.render(fp)
+
+    # same output as the former rendering path, through jinja
+    assert fp.getvalue() == format_file_content(Template(str(makefile)).render())
+    assert size == len(fp.getvalue())
+    assert fp.getvalue().endswith("\tpytest tests\n")
+
+
+def test_makefile_render_blank_lines_in_recipes():
+    from medikit.utils import format_file_content
+
+    makefile = Makefile()
+    makefile.add_target("foo", "echo a\n\necho b")
+
+    fp = io.StringIO()
+    makefile.render(fp)
+    assert "\techo a\n\n\techo b\n" in fp.getvalue()
+    assert fp.getvalue() == format_file_content(str(makefile))
+
+
+def test_makefile_render_is_not_a_template():
+    makefile = Makefile()
+    makefile.add_target("docker-inspect", "docker inspect --format '{{ .Id }}' foo")
+
+    fp = io.StringIO()
+    makefile.render(fp)
+    assert "\tdocker inspect --format '{{ .Id }}' foo\n" in fp.getvalue()
+
+
+@pytest.mark.skipif(not shutil.which("flock"), reason="flock is not available.")
+def test_install_targets_are_parallel_safe(tmpwd):
+    makefile = Makefile()
+    for extra in (None, "dev", "prod"):
+        target = makefile.add_install_target(extra)
+        # fails if another install runs at the same time, even between two commands of the same target
+        target.install += ["test ! -e busy", "touch busy", "sh -c 'sleep 0.2'", "rm busy"]
+
+    assert "\n.medikit/install-dev:  | .medikit\n" in str(makefile)
+
+    with open("Makefile", "w") as f:
+        makefile.render(f)
+    subprocess.run(["make", "-s", "-j4", "install", "install-dev", "install-prod"], check=True)
+
+    assert sorted(os.listdir(".medikit")) == ["install", "install-dev", "install-prod", "install.lock"]
+
+
+@pytest.mark.skipif(not shutil.which("flock"), reason="flock is not available.")
+def test_install_target_quoting_and_echo(tmpwd):
+    makefile = Makefile()
+    makefile["MESSAGE"] = "it's installed"
+    target = makefile.add_install_target()
+    target.install += ['@echo "$(MESSAGE)" > message.txt', "@-false"]
+
+    content = str(makefile)
+    assert "\t@$(INSTALL_LOCK) \\\n" in content, "all the commands are silent, so is the install"
+
+    with open("Makefile", "w") as f:
+        makefile.render(f)
+    output = subprocess.run(["make", "install"], check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    assert tmpwd.join("message.txt").read() == "it's installed\n"
+    assert not "INSTALL_LOCK" in output and not "flock" in output
+
+
+def test_install_target_name_is_computed_at_generation_time():
+    makefile = Makefile()
+    makefile.add_install_target("dev")
+
+    content = str(makefile)
+    assert not "$(shell" in content
+    assert '@printf "Applying \\033[36m%s\\033[0m target...\\n" install-dev\n' in content
+
+
+class TestMakeFeature(FeatureTestCase):
+    feature_type = MakeFeature
+    required_features = {"make"}
+
+    def create_config(self):
+        config = super().create_config()
+        config.set_vars(PACKAGE="foo")
+        return config
+
+    def test_ci_target(self):
+        feature, dispatcher = self.create_feature()
+        feature.makefile.add_target("test", "pytest", phony=True)
+        feature.on_start(ProjectEvent(config=self.create_config(), variables={}))
+        assert dict(feature.makefile.targets)["ci"].deps == ("test",)
+
+    def test_custom_ci_target(self):
+        feature, dispatcher = self.create_feature()
+        dispatcher.add_listener(
+            MakeConfig.on_generate, lambda event: event.makefile.add_target("ci", "tox", phony=True)
+        )
+        feature.makefile.add_target("test", "pytest", phony=True)
+        feature.on_start(ProjectEvent(config=self.create_config(), variables={}))
+        assert list(feature.makefile.get_target("ci")) == ["tox"]
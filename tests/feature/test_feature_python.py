@@ -53,6 +53,7 @@ class TestPythonFeature(FeatureTestCase):
         make_feature.on_start(ProjectEvent(config=config, setup={"name": PACKAGE_NAME}))
 
         assert sorted(dict(make_feature.makefile.targets).keys()) == [
+            ".medikit",
             "clean",
             "help",
             "install",
@@ -72,3 +73,28 @@ class TestPythonFeature(FeatureTestCase):
 
         assert event.setup["name"] == PACKAGE_NAME
         assert event.setup["python_requires"] == ">=3.5"
+
+    def test_on_make_generate_with_hashes(self):
+        python_feature, dispatcher = self.create_feature()
+        config = self.create_config()
+        config["python"].generate_hashes = True
+
+        makefile = Makefile()
+        makefile.add_install_target()
+        python_feature.on_make_generate(MakefileEvent(PACKAGE_NAME, makefile, config))
+
+        assert makefile.get_target("install").install[-2:] == [
+            "$(PIP) install $(PIP_INSTALL_OPTIONS) --require-hashes -r $(PYTHON_REQUIREMENTS_FILE)",
+            '$(PIP) install $(PIP_INSTALL_OPTIONS) -U $(PYTHON_REQUIREMENTS_INLINE) -e "."',
+        ]
+
+    def test_on_end_with_hashes_and_vendors(self):
+        python_feature, dispatcher = self.create_feature()
+        config = self.create_config()
+        config["python"].generate_hashes = True
+        config["python"].override_requirements = True
+        config["python"].add_vendors("git+https://example.com/foo.git#egg=foo")
+
+        with pytest.raises(ValueError) as excinfo:
+            python_feature.on_end(ProjectEvent(config=config, setup={"name": PACKAGE_NAME}))
+        assert "--require-hashes" in str(excinfo.value)
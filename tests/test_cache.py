@@ -0,0 +1,60 @@
+import os
+from unittest.mock import patch
+
+from medikit.cache import FileCache, NullCache, get_cache, hash_key
+from medikit.events import LoggingDispatcher
+from medikit.feature import Feature
+
+
+def test_hash_key():
+    assert hash_key("foo", "bar") == hash_key("foo", b"bar")
+    assert hash_key("foo", "bar") != hash_key("foob", "ar")
+
+
+def test_file_cache(tmpdir):
+    cache = FileCache(str(tmpdir.join("cache")))
+    assert cache.get("foo") is None
+    cache.set("foo", "bar")
+    assert cache.get("foo") == "bar"
+    assert get_cache("cache", cache_dir=str(tmpdir)).get("foo") == "bar"
+    assert isinstance(get_cache("cache", cache_dir=None), NullCache)
+
+
+def test_file_cache_eviction(tmpdir):
+    cache = FileCache(str(tmpdir), max_size=12)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.set(key, "1234")
+        os.utime(str(tmpdir.join(key)), (i, i))
+    cache.get("a")  # most recently used, now
+    cache.set("d", "1234")
+    assert sorted(os.listdir(str(tmpdir))) == ["a", "c", "d"]
+
+    # the directory is scanned once, by the first write (of each instance)
+    cache = FileCache(str(tmpdir), max_size=12)
+    with patch("os.scandir", wraps=os.scandir) as scandir:
+        for key in ("e", "f", "e"):
+            cache.set(key, "1234")
+        assert scandir.call_count == 1
+    assert sorted(os.listdir(str(tmpdir))) == ["d", "e", "f"]
+
+
+def test_format_python_is_cached(tmpdir):
+    feature = Feature(LoggingDispatcher())
+    feature.cache_dir = str(tmpdir)
+
+    assert feature.format_python("x = ( 1,2 )\n", filename="foo.py") == "x = (1, 2)\n"
+    with patch("yapf.yapf_api.FormatCode", return_value=("x = (1, 2)\n", True)) as format_code:
+        assert feature.format_python("x = ( 1,2 )\n", filename="bar.py") == "x = (1, 2)\n"
+        assert format_code.call_count == 0
+        feature.format_python("x = ( 1,2 )\n", filename="foo.py", style_config="google")
+        assert format_code.call_count == 1
+
+
+def test_inline_templates_are_cached(tmpdir):
+    feature = Feature(LoggingDispatcher())
+    feature.cache_dir = str(tmpdir)
+
+    template = feature.get_inline_template("Hello {{ name }}!")
+    assert template.render(name="world") == "Hello world!"
+    assert feature.get_inline_template("Hello {{ name }}!") is template
+    assert len(tmpdir.join("jinja").listdir()) == 1
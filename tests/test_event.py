@@ -1,9 +1,11 @@
+import threading
+import time
 from collections import OrderedDict
 from unittest import TestCase
 
 import pytest
 
-from medikit.events import ProjectEvent
+from medikit.events import ListenerProfiler, LoggingDispatcher, ProjectEvent, get_batches, subscribe
 
 
 class TestProjectEvent(TestCase):
@@ -25,3 +27,130 @@ class TestProjectEvent(TestCase):
 
         with pytest.raises(TypeError):
             self._test_constructor(unknown="foo")
+
+
+def test_listener_profiler():
+    dispatcher = LoggingDispatcher()
+    dispatcher.profiler = ListenerProfiler()
+
+    def fast(event):
+        pass
+
+    def slow(event):
+        time.sleep(0.01)
+
+    dispatcher.add_listener("foo", fast)
+    dispatcher.listen("foo")(slow)
+    dispatcher.dispatch("foo")
+    dispatcher.dispatch("foo")
+
+    summary = dispatcher.profiler.get_summary()
+    assert [(row["listener"], row["event"], row["calls"]) for row in summary] == [
+        ("test_listener_profiler.<locals>.slow", "foo", 2),
+        ("test_listener_profiler.<locals>.fast", "foo", 2),
+    ]
+    assert summary[0]["wall"] >= 0.02
+
+
+def test_listener_profiler_from_worker_threads():
+    profiler = ListenerProfiler()
+    listener = profiler.wrap("foo", lambda event: None)
+
+    def call():
+        for _ in range(1000):
+            listener(None)
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    (row,) = profiler.get_summary()
+    assert row["calls"] == 8000
+
+
+def _declare(reads=(), writes=()):
+    def wrapper(f):
+        return subscribe("foo", reads=reads, writes=writes)(f)
+
+    return wrapper
+
+
+def test_get_batches():
+    @_declare(writes=("a",))
+    def write_a(event):
+        pass
+
+    @_declare(writes=("b",))
+    def write_b(event):
+        pass
+
+    @_declare(reads=("a",))
+    def read_a(event):
+        pass
+
+    @_declare(reads=("b",))
+    def read_b(event):
+        pass
+
+    def undeclared(event):
+        pass
+
+    assert get_batches([write_a, write_b, read_a, read_b]) == [[write_a, write_b], [read_a, read_b]]
+    assert get_batches([read_a, read_b, write_b]) == [[read_a, read_b], [write_b]]
+    assert get_batches([write_a, undeclared, write_b]) == [[write_a], [undeclared], [write_b]]
+
+
+def test_concurrent_dispatch():
+    dispatcher = LoggingDispatcher()
+    dispatcher.max_workers = 4
+
+    barrier, calls = threading.Barrier(2, timeout=5), []
+
+    @_declare(writes=("a",))
+    def write_a(event):
+        barrier.wait()  # would time out if write_b did not run at the same time
+        calls.append("write_a")
+
+    @_declare(writes=("b",))
+    def write_b(event):
+        barrier.wait()
+        calls.append("write_b")
+
+    @_declare(reads=("a", "b"))
+    def read_ab(event):
+        calls.append("read_ab")
+
+    def first(event):
+        calls.append("first")
+
+    dispatcher.add_listener("foo", write_a)
+    dispatcher.add_listener("foo", write_b)
+    dispatcher.add_listener("foo", read_ab)
+    dispatcher.add_listener("foo", first, priority=-1)
+
+    dispatcher.dispatch("foo")
+
+    assert calls[0] == "first"
+    assert sorted(calls[1:3]) == ["write_a", "write_b"]
+    assert calls[3] == "read_ab"
+
+
+def test_concurrent_dispatch_errors():
+    dispatcher = LoggingDispatcher()
+    dispatcher.max_workers = 2
+
+    @_declare(writes=("a",))
+    def fail(event):
+        raise ValueError("failed")
+
+    @_declare(writes=("b",))
+    def succeed(event):
+        pass
+
+    dispatcher.add_listener("foo", fail)
+    dispatcher.add_listener("foo", succeed)
+
+    with pytest.raises(ValueError):
+        dispatcher.dispatch("foo")
@@ -0,0 +1,64 @@
+import os
+
+from whistle import EventDispatcher
+
+from medikit.file import UNCHANGED, WRITTEN, File, get_file_stats
+
+
+def test_file_written_only_when_changed(tmpwd):
+    dispatcher = EventDispatcher()
+    events = []
+    dispatcher.add_listener("medikit.on_file_closed", lambda event: events.append(event.filename))
+
+    with File(dispatcher, "foo.txt", override=True) as f:
+        f.write("foo\n")
+    assert open("foo.txt").read() == "foo\n"
+    assert events == ["foo.txt"]
+
+    os.utime("foo.txt", (0, 0))
+    with File(dispatcher, "foo.txt", override=True) as f:
+        f.write("foo\n")
+    assert os.stat("foo.txt").st_mtime == 0
+    assert events == ["foo.txt"]
+
+    with File(dispatcher, "foo.txt", override=True) as f:
+        f.write("bar\n")
+    assert open("foo.txt").read() == "bar\n"
+    assert events == ["foo.txt", "foo.txt"]
+
+    assert get_file_stats(dispatcher) == {WRITTEN: 2, UNCHANGED: 1}
+
+
+def test_file_events_only_dispatched_on_change(tmpwd):
+    dispatcher = EventDispatcher()
+    events = []
+    dispatcher.add_listener("medikit.on_file_opened", lambda event: events.append(("opened", event.filename)))
+    dispatcher.add_listener("medikit.on_file_closed", lambda event: events.append(("closed", event.filename)))
+
+    for _ in range(2):
+        with File(dispatcher, "foo.txt", override=True) as f:
+            f.write("foo\n")
+    assert events == [("opened", "foo.txt"), ("closed", "foo.txt")]
+    assert get_file_stats(dispatcher) == {WRITTEN: 1, UNCHANGED: 1}
+
+
+def test_file_opened_listeners_write_first(tmpwd):
+    dispatcher = EventDispatcher()
+    dispatcher.add_listener("medikit.on_file_opened", lambda event: event.file.write("# header\n"))
+
+    for _ in range(2):
+        with File(dispatcher, "foo.txt", override=True) as f:
+            f.write("foo\n")
+    assert open("foo.txt").read() == "# header\nfoo\n"
+    assert get_file_stats(dispatcher) == {WRITTEN: 1, UNCHANGED: 1}
+
+
+def test_file_not_overriden(tmpwd):
+    dispatcher = EventDispatcher()
+    with open("foo.txt", "w") as f:
+        f.write("foo\n")
+
+    with File(dispatcher, "foo.txt") as f:
+        f.write("bar\n")
+    assert open("foo.txt").read() == "foo\n"
+    assert get_file_stats(dispatcher) == {}
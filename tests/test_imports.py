@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("git", "git_semver", "jinja2", "pip", "piptools", "yapf")
+
+
+@pytest.mark.parametrize(
+    "module", ["medikit", "medikit.__main__", "medikit.feature.python", "medikit.feature.sphinx", "medikit.steps"]
+)
+def test_no_heavy_imports_at_startup(module):
+    source = "import sys, {module}; print(' '.join(m for m in {heavy!r} if m in sys.modules))".format(
+        module=module, heavy=HEAVY_MODULES
+    )
+    output = subprocess.check_output([sys.executable, "-c", source], universal_newlines=True)
+    assert output.strip() == ""
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+import pytest
+
+import medikit
+from medikit.config.loader import get_feature_names, get_feature_versions, load_feature
+from medikit.feature.make import MakeFeature
+
+
+def test_get_feature_names():
+    assert {"git", "make", "python"} <= set(get_feature_names())
+
+
+def test_get_feature_versions():
+    assert get_feature_versions(["make", "not-a-feature"]) == {"make": medikit.__version__, "not-a-feature": None}
+
+
+def test_load_feature():
+    assert load_feature("make") is MakeFeature
+    with pytest.raises(ValueError):
+        load_feature("not-a-feature")
+
+
+def test_feature_modules_are_loaded_on_demand():
+    source = "; ".join(
+        (
+            "import sys",
+            "from medikit.config.loader import get_feature_names, load_feature",
+            "get_feature_names()",
+            "load_feature('git')",
+            "print('medikit.feature.git' in sys.modules, 'medikit.feature.docker' in sys.modules)",
+        )
+    )
+    output = subprocess.check_output([sys.executable, "-c", source], universal_newlines=True)
+    assert output.split() == ["True", "False"]
@@ -0,0 +1,29 @@
+import os
+from unittest.mock import patch
+
+import medikit
+from medikit.__main__ import get_version
+
+
+def test_get_version_without_git(tmpdir):
+    with patch("medikit.__file__", str(tmpdir.join("medikit", "__init__.py"))):
+        assert get_version() == medikit.__version__
+
+
+def test_get_version_is_cached(tmpdir):
+    tmpdir.join(".git", "HEAD").write("ref: refs/heads/master\n", ensure=True)
+    tmpdir.join(".git", "refs", "heads", "master").write("0" * 40 + "\n", ensure=True)
+
+    with patch("medikit.__file__", str(tmpdir.join("medikit", "__init__.py"))), patch(
+        "medikit.__main__.check_output", return_value=b"1.2.3\n"
+    ) as check_output:
+        assert get_version() == "1.2.3 (git)"
+        assert get_version() == "1.2.3 (git)"
+        assert check_output.call_count == 1
+
+        # new tag, the cache is invalidated
+        tmpdir.join(".git", "refs", "tags", "1.2.4").write("0" * 40 + "\n", ensure=True)
+        os.utime(str(tmpdir.join(".git", "refs", "tags")), (0, 0))
+        check_output.return_value = b"1.2.4\n"
+        assert get_version() == "1.2.4 (git)"
+        assert check_output.call_count == 2
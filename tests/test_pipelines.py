@@ -1,3 +1,7 @@
+import glob
+import json
+import os
+
 import pytest
 
 from medikit.steps import Step
@@ -15,3 +19,236 @@ def test_failing_step():
     with pytest.raises(RuntimeError):
         step.run({})
     assert not step.complete
+
+
+def test_add_before():
+    from medikit.pipeline import Pipeline
+    from medikit.steps.exec import System
+
+    pipeline = Pipeline()
+    pipeline.add(System("b")).add(System("c"))
+    pipeline.add(System("a"), before="System('b', False)")
+    pipeline.add(System("bb"), before="System('c', False)")
+
+    assert [step.cmd for step in pipeline] == ["a", "b", "bb", "c"]
+
+    with pytest.raises(ValueError):
+        pipeline.add(System("d"), before="System('unknown', False)")
+
+
+class DummyStep(Step):
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def run(self, meta):
+        self.set_complete()
+
+
+def _create_pipeline(pipeline):
+    from medikit.pipeline import ConfiguredPipeline
+
+    pipeline = ConfiguredPipeline("test", pipeline)
+    pipeline.init()
+    return pipeline
+
+
+def test_sequential_by_default():
+    from medikit.pipeline import Pipeline
+
+    pipeline = Pipeline().add(DummyStep("a")).add(DummyStep("b")).add(DummyStep("c"))
+    pipeline = _create_pipeline(pipeline)
+
+    names = []
+    for _ in range(3):
+        assert len(pipeline.get_ready_steps()) == 1
+        step = pipeline.next()
+        step.run(pipeline.meta)
+        names.append(step.name)
+    assert names == ["a", "b", "c"]
+
+    with pytest.raises(StopIteration):
+        pipeline.next()
+
+
+def test_ready_steps_with_dependencies():
+    from medikit.pipeline import Pipeline
+
+    pipeline = Pipeline().add(DummyStep("bump"))
+    pipeline.add(DummyStep("docs"), after="bump").add(DummyStep("build"), after=["bump"])
+    pipeline.add(DummyStep("commit"), after=("docs", "build"))
+    pipeline = _create_pipeline(pipeline)
+
+    assert [step.name for step in pipeline.get_ready_steps()] == ["bump"]
+    pipeline.next().run(pipeline.meta)
+    assert [step.name for step in pipeline.get_ready_steps()] == ["docs", "build"]
+    pipeline.steps[2].run(pipeline.meta)
+    assert [step.name for step in pipeline.get_ready_steps()] == ["docs"]
+    pipeline.next().run(pipeline.meta)
+    assert [step.name for step in pipeline.get_ready_steps()] == ["commit"]
+    assert pipeline.get_position(pipeline.next()) == 4
+
+
+def test_default_dependencies_join_previous_steps():
+    from medikit.pipeline import Pipeline
+
+    pipeline = Pipeline().add(DummyStep("bump"))
+    pipeline.add(DummyStep("reqs"), after="bump").add(DummyStep("docs"), after="bump").add(DummyStep("commit"))
+    pipeline = _create_pipeline(pipeline)
+
+    pipeline.next().run(pipeline.meta)
+    assert [step.name for step in pipeline.get_ready_steps()] == ["reqs", "docs"]
+    pipeline.steps[2].run(pipeline.meta)
+    assert [step.name for step in pipeline.get_ready_steps()] == ["reqs"]
+    pipeline.next().run(pipeline.meta)
+    assert [step.name for step in pipeline.get_ready_steps()] == ["commit"]
+
+
+def test_unknown_or_cyclic_dependencies():
+    from medikit.pipeline import Pipeline
+
+    pipeline = Pipeline().add(DummyStep("a"))
+    with pytest.raises(ValueError):
+        pipeline.add(DummyStep("b"), after="unknown")
+
+    pipeline.add(DummyStep("b"), after="a")
+    pipeline.dependencies["a"] = ["b"]
+    pipeline = _create_pipeline(pipeline)
+    assert pipeline.get_ready_steps() == []
+    with pytest.raises(RuntimeError):
+        pipeline.next()
+
+
+STRESS_PROJECTFILE = """
+from medikit import pipeline, require
+from medikit.steps.exec import System
+
+require("git").disable()
+
+with pipeline("stress") as stress:
+    stress.add(System("test -f ready"))
+    for i in range({steps}):
+        stress.add(System("echo {{}} >> steps.log && sleep 0.01".format(i)))
+"""
+
+
+def _continue_pipeline(config_filename):
+    from medikit.commands import PipelineCommand
+
+    # any exception (including the pipeline being completed by another process first) fails the process.
+    PipelineCommand.handle(config_filename, pipeline="stress", action="continue")
+
+
+def test_concurrent_continue_runs_each_step_once(tmpwd):
+    import multiprocessing
+
+    from medikit.commands import PipelineCommand
+
+    tmpwd.join("Projectfile").write(STRESS_PROJECTFILE.format(steps=20))
+    config_filename = str(tmpwd.join("Projectfile"))
+
+    # the first step fails until the "ready" file exists, leaving the pipeline started
+    with pytest.raises(RuntimeError):
+        PipelineCommand.handle(config_filename, pipeline="stress", action="start")
+    tmpwd.join("ready").write("")
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_continue_pipeline, args=(config_filename,)) for _ in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    # each step ran exactly once, in order
+    assert tmpwd.join("steps.log").read().split() == list(map(str, range(20)))
+
+    (state_file,) = glob.glob(".medikit/pipelines/stress.*.json")
+    with open(state_file) as f:
+        state = json.load(f)
+    assert all(step_state["complete"] for identity, step_state in state["steps"])
+    assert not glob.glob(".medikit/pipelines/*.tmp")
+
+    # continuing a finished pipeline only reports it, and "continue" without any state still fails
+    _continue_pipeline(config_filename)
+    os.unlink(state_file)
+    with pytest.raises(FileNotFoundError):
+        _continue_pipeline(config_filename)
+
+
+def test_step_cache(tmpwd):
+    from medikit.pipeline import StepCache
+    from medikit.steps.exec import System
+
+    step = System("build", inputs=("*.in",), outputs=("out.txt",))
+    tmpwd.join("a.in").write("a")
+    tmpwd.join("out.txt").write("built")
+
+    cache = StepCache("steps.cache")
+    assert not cache.is_valid(step)
+    cache.set(step)
+    assert cache.write()
+    assert not cache.write(), "nothing changed"
+
+    cache = StepCache("steps.cache")
+    assert cache.is_valid(step)
+    assert not cache.is_valid(System("build")), "steps without inputs or outputs are never cached"
+
+    # inputs changed, or added
+    tmpwd.join("a.in").write("b")
+    assert not cache.is_valid(step)
+    tmpwd.join("a.in").write("a")
+    assert cache.is_valid(step)
+    tmpwd.join("b.in").write("b")
+    assert not cache.is_valid(step)
+    tmpwd.join("b.in").remove()
+
+    # outputs touched, or removed
+    os.utime("out.txt", (0, 0))
+    assert not cache.is_valid(step)
+    os.unlink("out.txt")
+    assert not cache.is_valid(step)
+
+
+def test_continue_skips_cached_steps(tmpwd):
+    from medikit.commands import PipelineCommand
+
+    tmpwd.join("Projectfile").write(
+        """
+from medikit import pipeline, require
+from medikit.steps.exec import System
+
+require("git").disable()
+
+with pipeline("cached") as cached:
+    cached.add(System("cat input.txt >> output.txt", inputs=("input.txt",), outputs=("output.txt",)))
+    cached.add(System("echo done >> done.txt; test -f ok"))
+"""
+    )
+    tmpwd.join("input.txt").write("built\n")
+    config_filename = str(tmpwd.join("Projectfile"))
+
+    with pytest.raises(RuntimeError):
+        PipelineCommand.handle(config_filename, pipeline="cached", action="start")
+    # the state is saved after each step, failed or not
+    with open(".medikit/pipelines/cached.json") as f:
+        assert [step_state.get("complete", False) for identity, step_state in json.load(f)["steps"]] == [True, False]
+    tmpwd.join("ok").write("")
+    PipelineCommand.handle(config_filename, pipeline="cached", action="start", force=True)
+    assert tmpwd.join("output.txt").read() == "built\n"
+    assert tmpwd.join("done.txt").read() == "done\ndone\n"
+
+    # the cache is cleared on completion, the next run starts from scratch
+    assert not os.path.exists(".medikit/pipelines/cached.cache")
+    PipelineCommand.handle(config_filename, pipeline="cached", action="start")
+    assert tmpwd.join("output.txt").read() == "built\nbuilt\n"
+
+    # the cache hit is recorded in the pipeline state
+    states = []
+    for state_file in sorted(glob.glob(".medikit/pipelines/cached.*.json")):
+        with open(state_file) as f:
+            states.append([step_state.get("cached", False) for identity, step_state in json.load(f)["steps"]])
+    assert states == [[True, False], [False, False]]
@@ -0,0 +1,69 @@
+import os
+import signal
+import sys
+import threading
+import time
+
+import pytest
+
+from medikit.steps.exec import System
+from medikit.steps.utils.process import LEGACY_CHILD_WATCHER, Process, forward_signals
+
+
+def _run(cmd, **kwargs):
+    started, batches = [], []
+    returncode = Process(cmd, on_start=started.append, on_output=batches.append, **kwargs).run()
+    return returncode, started, batches
+
+
+def test_process_output():
+    returncode, started, batches = _run("printf 'foo\\nbar\\n\\nbaz'; exit 3")
+    assert returncode == 3
+    assert len(started) == 1 and started[0] > 0
+    assert "".join(batches) == "foo\nbar\n\nbaz\n"
+    assert all(batch.endswith("\n") for batch in batches)
+
+
+def test_process_output_is_batched():
+    returncode, started, batches = _run("seq 1 10000", chunk_size=4096)
+    assert returncode == 0
+    assert "".join(batches) == "".join("{}\n".format(i) for i in range(1, 10001))
+    assert len(batches) < 100
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="posix signals")
+def test_process_signal_forwarding():
+    process = Process("sleep 10", on_start=lambda pid: timer.start())
+    timer = threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGTERM))
+    started_at = time.perf_counter()
+    assert process.run() == -signal.SIGTERM
+    assert time.perf_counter() - started_at < 5
+
+
+@pytest.mark.skipif(LEGACY_CHILD_WATCHER, reason="subprocesses can only run from the main thread before python 3.8")
+def test_process_signal_forwarding_from_threads():
+    returncodes = []
+    threads = [threading.Thread(target=lambda: returncodes.append(Process("sleep 10").run())) for _ in range(2)]
+    timer = threading.Timer(0.5, os.kill, (os.getpid(), signal.SIGTERM))
+    started_at = time.perf_counter()
+    with forward_signals():
+        for thread in threads:
+            thread.start()
+        timer.start()
+        for thread in threads:
+            thread.join()
+    assert returncodes == [-signal.SIGTERM, -signal.SIGTERM]
+    assert time.perf_counter() - started_at < 5
+
+
+def test_system_step(capsys):
+    step = System("echo foo; echo bar")
+    step.run({})
+    assert step.complete
+    out = capsys.readouterr().out
+    assert "foo\n" in out and "bar\n" in out
+
+    step = System("echo foo; false")
+    with pytest.raises(RuntimeError):
+        step.run({})
+    assert not step.complete
@@ -0,0 +1,279 @@
+import hashlib
+import os
+import time
+import zipfile
+
+import pytest
+
+from medikit.resolver import (
+    MetadataCache,
+    RequirementsLock,
+    RequirementsResolver,
+    parse_distribution_filename,
+    read_wheel_requirements,
+    resolve_requirements,
+)
+
+
+def fake_resolve(requirements, *, cache_dir, seed=None, max_rounds=10, **options):
+    version = "1.0" if seed is None else "2.0"
+    pins = {line.split()[0]: line.split()[0] + "==" + version for line in requirements}
+    for line in seed or ():
+        name = line.split("==")[0]
+        if name in pins:
+            pins[name] = line
+    return pins, {}
+
+
+def test_resolve_base_only():
+    resolver = RequirementsResolver(cache_dir="/tmp", resolve=fake_resolve)
+    resolutions = resolver.resolve({None: ["foo ~=1.0"]})
+    assert list(resolutions) == [None]
+    assert resolutions[None].requirements == {"foo": "foo==1.0"}
+    assert resolutions[None].duration >= 0
+
+
+def test_resolve_extras_are_seeded_with_base():
+    requirements = {None: ["foo"], "dev": ["foo", "bar"], "prod": ["baz"]}
+    for max_workers in (1, 2):
+        resolver = RequirementsResolver(cache_dir="/tmp", max_workers=max_workers, resolve=fake_resolve)
+        resolutions = resolver.resolve(requirements, ["dev", "prod"])
+        assert sorted(resolutions, key=str) == [None, "dev", "prod"]
+        assert resolutions["dev"].requirements == {"foo": "foo==1.0", "bar": "bar==2.0"}
+        assert resolutions["prod"].requirements == {"baz": "baz==2.0"}
+
+
+def _create_wheel(path, name, version, requires=()):
+    filename = os.path.join(path, "{}-{}-py3-none-any.whl".format(name, version))
+    with zipfile.ZipFile(filename, "w") as archive:
+        archive.writestr(
+            "{}-{}.dist-info/METADATA".format(name, version),
+            "\n".join(
+                (
+                    "Metadata-Version: 2.1",
+                    "Name: " + name,
+                    "Version: " + version,
+                    *("Requires-Dist: " + requirement for requirement in requires),
+                )
+            ),
+        )
+    return filename
+
+
+def test_parse_distribution_filename():
+    assert parse_distribution_filename("Foo_Bar-1.0-py3-none-any.whl") == ("foo-bar", "1.0")
+    assert parse_distribution_filename("foo-bar-2.0.tar.gz") == ("foo-bar", "2.0")
+    assert parse_distribution_filename("README.txt") is None
+
+
+def test_read_wheel_requirements(tmpdir):
+    filename = _create_wheel(
+        str(tmpdir), "foo", "1.0", ["bar (>=1.0)", 'baz ; extra == "dev"', 'old ; python_version < "3"']
+    )
+    assert read_wheel_requirements(filename) == ["bar>=1.0"]
+    assert read_wheel_requirements(filename, ["dev"]) == ["bar>=1.0", "baz"]
+
+
+def test_metadata_cache(tmpdir):
+    cache_dir = str(tmpdir.join("cache"))
+
+    metadata = MetadataCache(cache_dir, index_urls=["https://pypi.org/simple"])
+    assert metadata.get_versions("foo") is None
+    metadata.set_versions("Foo", ["1.0", "1.1"])
+    metadata.set_dependencies("foo", "1.1", [], ["bar>=1.0"])
+    assert metadata.get_versions("foo") == ["1.0", "1.1"]
+    assert metadata.get_dependencies("foo", "1.1") == ["bar>=1.0"]
+    assert metadata.get_dependencies("foo", "1.1", ["dev"]) is None
+
+    # keyed by index
+    other = MetadataCache(cache_dir, index_urls=["file:///tmp/index"])
+    assert other.get_versions("foo") is None
+
+    # stale versions are ignored online, but not offline
+    stale = MetadataCache(cache_dir, index_urls=["https://pypi.org/simple"], max_age=-1)
+    assert stale.get_versions("foo") is None
+    stale.offline = True
+    assert stale.get_versions("foo") == ["1.0", "1.1"]
+
+    # upgrading: versions cached before are looked up again, versions cached since are used
+    upgrading = MetadataCache(cache_dir, index_urls=["https://pypi.org/simple"], refresh_before=time.time() + 1)
+    assert upgrading.get_versions("foo") is None
+    upgrading.refresh_before = time.time() - 1
+    assert upgrading.get_versions("foo") == ["1.0", "1.1"]
+
+
+def test_metadata_cache_offline_wheelhouse(tmpdir):
+    wheelhouse = str(tmpdir.mkdir(".wheelhouse"))
+    _create_wheel(wheelhouse, "bar", "1.0")
+    _create_wheel(wheelhouse, "bar", "1.2", ["baz"])
+
+    online = MetadataCache(None, index_urls=[], wheelhouses=[wheelhouse])
+    assert online.get_versions("bar") is None
+
+    offline = MetadataCache(None, index_urls=[], offline=True, wheelhouses=[wheelhouse, str(tmpdir.join("missing"))])
+    assert offline.get_versions("bar") == ["1.0", "1.2"]
+    assert offline.get_dependencies("bar", "1.2") == ["baz"]
+    assert offline.get_dependencies("bar", "2.0") is None
+    assert offline.get_versions("baz") is None
+
+
+def test_lock_only_resolves_changed_extras(tmpdir):
+    calls = []
+
+    def counting_resolve(requirements, **options):
+        calls.append((requirements, options["seed"]))
+        return fake_resolve(requirements, **options)
+
+    filename = str(tmpdir.join(".medikit", "requirements.lock.json"))
+    resolver = RequirementsResolver(cache_dir="/tmp", max_workers=1, resolve=counting_resolve)
+    requirements = {None: ["foo"], "dev": ["foo", "bar"], "prod": ["baz"]}
+
+    lock = RequirementsLock(filename)
+    resolver.resolve(requirements, ["dev", "prod"], lock=lock)
+    assert len(calls) == 3
+    assert lock.write()
+
+    # nothing changed, everything comes from the lock
+    calls.clear()
+    lock = RequirementsLock(filename)
+    resolutions = resolver.resolve(requirements, ["dev", "prod"], lock=lock)
+    assert calls == []
+    assert all(resolution.locked for resolution in resolutions.values())
+    assert resolutions["dev"].requirements == {"foo": "foo==1.0", "bar": "bar==2.0"}
+    assert not lock.write()
+
+    # adding a dev dependency only resolves dev, seeded with base and previous dev pins
+    calls.clear()
+    lock = RequirementsLock(filename)
+    resolutions = resolver.resolve({**requirements, "dev": ["foo", "bar", "qux"]}, ["dev", "prod"], lock=lock)
+    assert calls == [(["foo", "bar", "qux"], ["bar==2.0", "foo==1.0"])]
+    assert resolutions["dev"].requirements == {"foo": "foo==1.0", "bar": "bar==2.0", "qux": "qux==2.0"}
+    assert resolutions["prod"].locked
+    assert lock.write()
+
+    # cleared lock (upgrade) resolves everything again
+    calls.clear()
+    lock = RequirementsLock(filename)
+    lock.clear()
+    resolver.resolve(requirements, ["dev", "prod"], lock=lock)
+    assert len(calls) == 3
+
+
+def test_lock_hashes(tmpdir):
+    def hashing_resolve(requirements, *, generate_hashes=False, **options):
+        pins, hashes = fake_resolve(requirements, **options)
+        return pins, ({name: ["sha256:" + name] for name in pins} if generate_hashes else {})
+
+    filename = str(tmpdir.join("requirements.lock.json"))
+    lock = RequirementsLock(filename)
+    RequirementsResolver(cache_dir="/tmp", resolve=hashing_resolve).resolve({None: ["foo"]}, lock=lock)
+    lock.write()
+
+    # locked resolution has no hashes, it must be resolved again if hashes are required
+    lock = RequirementsLock(filename)
+    resolver = RequirementsResolver(cache_dir="/tmp", generate_hashes=True, resolve=hashing_resolve)
+    resolutions = resolver.resolve({None: ["foo"]}, lock=lock)
+    assert not resolutions[None].locked
+    assert resolutions[None].hashes == {"foo": ["sha256:foo"]}
+    lock.write()
+
+    resolutions = resolver.resolve({None: ["foo"]}, lock=RequirementsLock(filename))
+    assert resolutions[None].locked
+    assert resolutions[None].hashes == {"foo": ["sha256:foo"]}
+
+
+def test_metadata_cache_hashes(tmpdir):
+    wheelhouse = str(tmpdir.mkdir(".wheelhouse"))
+    filename = _create_wheel(wheelhouse, "bar", "1.0")
+    with open(filename, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+
+    metadata = MetadataCache(str(tmpdir.join("cache")), index_urls=[], offline=True, wheelhouses=[wheelhouse])
+    assert metadata.get_hashes("bar", "1.0") == ["sha256:" + digest]
+    assert metadata.get_hashes("bar", "2.0") is None
+    metadata.set_hashes("bar", "2.0", ["sha256:abc"])
+    assert metadata.get_hashes("bar", "2.0") == ["sha256:abc"]
+
+
+def test_lock_hashes_disabled(tmpdir):
+    def hashing_resolve(requirements, *, generate_hashes=False, **options):
+        pins, hashes = fake_resolve(requirements, **options)
+        return pins, ({name: ["sha256:" + name] for name in pins} if generate_hashes else {})
+
+    filename = str(tmpdir.join("requirements.lock.json"))
+    lock = RequirementsLock(filename)
+    RequirementsResolver(cache_dir="/tmp", generate_hashes=True, resolve=hashing_resolve).resolve(
+        {None: ["foo"]}, lock=lock
+    )
+    lock.write()
+
+    # hashes were turned off, the locked resolution is still valid, but without hashes
+    resolver = RequirementsResolver(cache_dir="/tmp", resolve=hashing_resolve)
+    resolutions = resolver.resolve({None: ["foo"]}, lock=RequirementsLock(filename))
+    assert resolutions[None].locked
+    assert resolutions[None].hashes == {}
+
+
+def test_resolve_upgrade_refreshes_versions():
+    options = []
+
+    def recording_resolve(requirements, *, cache_dir, seed=None, max_rounds=10, **kwargs):
+        options.append(kwargs["refresh_before"])
+        return fake_resolve(requirements, cache_dir=cache_dir, seed=seed, max_rounds=max_rounds)
+
+    RequirementsResolver(cache_dir="/tmp", resolve=recording_resolve).resolve({None: ["foo"]})
+    assert options == [None]
+
+    started_at = time.time()
+    RequirementsResolver(cache_dir="/tmp", max_workers=1, upgrade=True, resolve=recording_resolve).resolve(
+        {None: ["foo"], "dev": ["bar"]}, ["dev"]
+    )
+    assert len(options) == 3 and options[1] == options[2] >= started_at
+
+
+@pytest.fixture()
+def index(tmpdir, monkeypatch):
+    """
+    Local, file based, package index (pip "simple" api), used as the only index. Returns a function to publish a wheel.
+
+    """
+    try:
+        import piptools.repositories  # noqa
+    except Exception as exc:
+        pytest.skip("pip-tools is not usable with the installed pip ({}).".format(exc))
+
+    root = tmpdir.mkdir("simple")
+    monkeypatch.setenv("PIP_CONFIG_FILE", os.devnull)
+    monkeypatch.setenv("PIP_INDEX_URL", "file://" + str(root))
+
+    def publish(name, version, requires=()):
+        path = root.join(name).ensure(dir=True)
+        _create_wheel(str(path), name, version, requires)
+        path.join("index.html").write(
+            "\n".join('<a href="{0}">{0}</a>'.format(filename) for filename in sorted(os.listdir(str(path))))
+        )
+
+    return publish
+
+
+def test_resolve_requirements_with_metadata_cache(tmpdir, index):
+    index("foo", "1.0", ["bar"])
+    index("bar", "1.0")
+    options = {"cache_dir": str(tmpdir.join("piptools")), "metadata_cache_dir": str(tmpdir.join("cache"))}
+
+    pins, hashes = resolve_requirements(["foo"], generate_hashes=True, **options)
+    assert pins == {"foo": "foo==1.0", "bar": "bar==1.0"}
+    assert sorted(hashes) == ["bar", "foo"]
+
+    # fresh cached versions do not match, released since: the index is looked up again.
+    index("foo", "2.0", ["bar"])
+    pins, hashes = resolve_requirements(["foo>=2.0"], generate_hashes=True, **options)
+    assert pins == {"foo": "foo==2.0", "bar": "bar==1.0"}
+
+    # offline, metadata (versions, dependencies, hashes) only comes from the cache.
+    tmpdir.join("simple").remove()
+    pins, hashes = resolve_requirements(["foo"], offline=True, generate_hashes=True, **options)
+    assert pins == {"foo": "foo==2.0", "bar": "bar==1.0"}
+    assert sorted(hashes) == ["bar", "foo"]
+    with pytest.raises(RuntimeError):
+        resolve_requirements(["foo>=3.0"], offline=True, **options)
@@ -0,0 +1,108 @@
+import configparser
+import os
+
+from medikit.resources.configparser import ConfigParserResource, IniDocument
+
+SETUP_CFG = """# Managed by hand, mostly.
+[metadata]
+description-file = README.rst
+
+; isort configuration
+[isort]
+line_length = 80
+known_first_party =
+    medikit
+    tests
+
+[other]
+foo: bar
+"""
+
+
+def test_ini_document_round_trip():
+    document = IniDocument(SETUP_CFG)
+    assert str(document) == SETUP_CFG
+    assert document.get("isort", "line_length") == "80"
+    assert document.get("isort", "KNOWN_FIRST_PARTY") == "medikit\ntests"
+    assert document.get("other", "foo") == "bar"
+    assert document.get("other", "baz") is None
+    assert document.get("nope", "foo", "default") == "default"
+
+
+def test_ini_document_set():
+    document = IniDocument(SETUP_CFG)
+    assert not document.set("isort", "line_length", "80")
+    assert not document.set("isort", "known_first_party", "medikit\ntests")
+    assert str(document) == SETUP_CFG
+
+    assert document.set("isort", "line_length", 120)
+    assert document.set("isort", "multi_line_output", "3")
+    assert document.set("bdist_wheel", "universal", "1")
+
+    assert str(document) == SETUP_CFG.replace("line_length = 80", "line_length = 120").replace(
+        "    tests\n", "    tests\nmulti_line_output = 3\n"
+    ) + ("\n[bdist_wheel]\nuniversal = 1\n\n")
+
+    parser = configparser.ConfigParser()
+    parser.read_string(str(document))
+    assert parser["isort"]["line_length"] == "120"
+    assert parser["isort"]["known_first_party"] == "\nmedikit\ntests"
+
+
+def test_ini_document_set_keeps_comments():
+    content = "[isort]\nline_length = 100\n  # indented comment\nknown_first_party =\n    medikit\n    # tests\n    foo\n"
+    document = IniDocument(content)
+    assert document.get("isort", "known_first_party") == "medikit\nfoo"
+
+    assert document.set("isort", "line_length", 120)
+    assert document.set("isort", "known_first_party", "bar")
+    assert str(document) == "[isort]\nline_length = 120\n  # indented comment\nknown_first_party = bar\n    # tests\n"
+
+
+def test_ini_document_commented_out_options():
+    document = IniDocument("[isort]\n#line_length = 100\n; multi_line_output = 3\n")
+    assert document.get("isort", "line_length") is None
+    assert document.get("isort", "#line_length") is None
+
+    assert document.set("isort", "line_length", 120)
+    assert str(document) == "[isort]\n#line_length = 100\n; multi_line_output = 3\nline_length = 120\n"
+
+
+def test_new_file_is_identical_to_configparser_output(tmpdir):
+    values = {"bdist_wheel": {"universal": "1"}, "metadata": {"description-file": "README.rst"}}
+    managed = {"isort": {"line_length": "120"}}
+
+    resource = ConfigParserResource()
+    resource.set_initial_values(values)
+    resource.set_managed_values(managed)
+
+    target = str(tmpdir.join("setup.cfg"))
+    assert resource.write(None, target)
+
+    parser = configparser.ConfigParser()
+    parser.read_dict(values)
+    parser.read_dict(managed)
+    expected = str(tmpdir.join("expected.cfg"))
+    with open(expected, "w") as f:
+        parser.write(f)
+
+    with open(target) as f, open(expected) as g:
+        assert f.read() == g.read()
+
+
+def test_existing_file_only_written_on_change(tmpdir):
+    target = str(tmpdir.join("setup.cfg"))
+    with open(target, "w") as f:
+        f.write(SETUP_CFG)
+    os.utime(target, (0, 0))
+
+    resource = ConfigParserResource()
+    resource.set_initial_values({"bdist_wheel": {"universal": "1"}})
+    resource.set_managed_values({"isort": {"line_length": "80"}})
+    assert not resource.write(None, target)
+    assert os.stat(target).st_mtime == 0
+
+    resource.set_managed_values({"isort": {"line_length": "120"}})
+    assert resource.write(None, target)
+    with open(target) as f:
+        assert f.read() == SETUP_CFG.replace("line_length = 80", "line_length = 120")
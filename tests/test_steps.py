@@ -0,0 +1,77 @@
+import subprocess
+
+import pytest
+
+from medikit.steps.exec import Commit
+from medikit.steps.utils.git import format_errors, run_on_remotes
+
+
+class FakeConfig:
+    def get_version(self):
+        return "1.0.0"
+
+
+def _git(*args, cwd=None):
+    return subprocess.run(("git", *args), cwd=cwd, check=True, stdout=subprocess.PIPE).stdout.decode().strip()
+
+
+@pytest.fixture()
+def repository(tmpwd, monkeypatch):
+    for name in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv("GIT_{}_NAME".format(name), "Test")
+        monkeypatch.setenv("GIT_{}_EMAIL".format(name), "test@example.com")
+
+    _git("init", "-q", "-b", "main", "work")
+    monkeypatch.chdir(str(tmpwd.join("work")))
+    tmpwd.join("work", "version.txt").write("1.0.0")
+    _git("add", "version.txt")
+
+    for remote in ("origin", "upstream"):
+        _git("init", "-q", "--bare", str(tmpwd.join(remote + ".git")))
+        _git("remote", "add", remote, str(tmpwd.join(remote + ".git")))
+    return tmpwd
+
+
+def test_run_on_remotes(repository):
+    _git("commit", "-q", "-m", "initial")
+    _git("remote", "add", "broken", str(repository.join("missing.git")))
+
+    errors = run_on_remotes(lambda remote: ["push", remote, "main"], ["origin", "upstream", "broken"])
+    assert list(errors) == ["broken"]
+    assert _git("rev-parse", "main", cwd=str(repository.join("upstream.git"))) == _git("rev-parse", "main")
+
+    # the whole process group is killed on timeout
+    timeouts = run_on_remotes(lambda remote: ["-c", "alias.slow=!sleep 10", "slow"], ["origin"], timeout=0.2)
+    assert list(timeouts) == ["origin"]
+    assert timeouts["origin"].startswith("timed out after 0.2s, git was killed and may not have completed")
+
+    message = format_errors("git push", {**errors, "other": "timed out after 1s."})
+    assert message.startswith("git push failed for 2 remote(s):\n  broken: ")
+    assert message.endswith("\n  other: timed out after 1s.")
+
+
+def test_commit_only_retries_failed_remotes(repository):
+    _git("commit", "-q", "-m", "initial")
+    repository.join("work", "version.txt").write("1.0.0\n")
+    _git("add", "version.txt")
+
+    upstream = repository.join("upstream.git")
+    upstream.rename(repository.join("moved.git"))
+
+    step = Commit("Release: {version}", tag=True)
+    step.config = FakeConfig()
+    with pytest.raises(RuntimeError) as excinfo:
+        step.run({"version": "1.0.0"})
+    assert "upstream" in str(excinfo.value) and not "origin:" in str(excinfo.value)
+    assert step.get_state() == {"committed": True, "pushed": {"origin": True, "upstream": False}}
+    assert not step.complete
+
+    # origin is not reachable anymore, and upstream is back: continuing must only push to upstream, without committing
+    # again.
+    repository.join("origin.git").rename(repository.join("gone.git"))
+    repository.join("moved.git").rename(upstream)
+    step.run({"version": "1.0.0"})
+    assert step.complete
+    assert step.get_state()["pushed"] == {"origin": True, "upstream": True}
+    assert _git("tag", cwd=str(upstream)) == "1.0.0"
+    assert _git("rev-list", "--count", "main") == "2"
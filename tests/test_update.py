@@ -0,0 +1,130 @@
+import functools
+import os
+import socket
+
+import pytest
+
+from medikit.commands import UpdateCommand
+from medikit.fingerprint import FINGERPRINT_FILE
+from medikit.resolver import RequirementsResolver
+
+PROJECTFILE = """
+from medikit import require
+
+PACKAGE = "foo"
+
+require("git").disable()
+"""
+
+
+def test_update_is_skipped_when_nothing_changed(tmpwd):
+    tmpwd.join("Projectfile").write(PROJECTFILE)
+    config_filename = str(tmpwd.join("Projectfile"))
+
+    UpdateCommand.handle(config_filename)
+    assert os.path.exists("Makefile")
+    assert os.path.exists(FINGERPRINT_FILE)
+
+    os.utime("Makefile", (0, 0))
+    UpdateCommand.handle(config_filename)
+    assert os.stat("Makefile").st_mtime == 0, "up to date, should not be rendered again"
+
+    os.unlink("Makefile")
+    UpdateCommand.handle(config_filename)
+    assert os.path.exists("Makefile"), "outputs changed, should be rendered again"
+
+    tmpwd.join("Projectfile").write(PROJECTFILE + '\nrequire("make").disable_medikit_targets()\n')
+    UpdateCommand.handle(config_filename)
+    assert not "update-requirements" in tmpwd.join("Makefile").read(), "inputs changed, should be rendered again"
+
+    os.utime(FINGERPRINT_FILE, (0, 0))
+    UpdateCommand.handle(config_filename)
+    assert os.stat(FINGERPRINT_FILE).st_mtime == 0
+    UpdateCommand.handle(config_filename, force=True)
+    assert os.stat(FINGERPRINT_FILE).st_mtime != 0
+
+
+def test_update_when_an_existing_file_is_removed(tmpwd, resolutions):
+    tmpwd.join("Projectfile").write(PYTHON_PROJECTFILE)
+    tmpwd.join(".gitignore").write("/build\n")
+    tmpwd.join("requirements.txt").write("-e .\n")
+    config_filename = str(tmpwd.join("Projectfile"))
+
+    # files created only if missing are update outputs too, even if they already existed
+    UpdateCommand.handle(config_filename)
+    assert tmpwd.join(".gitignore").read() == "/build\n"
+    assert tmpwd.join("requirements.txt").read() == "-e .\n"
+
+    os.unlink(".gitignore")
+    UpdateCommand.handle(config_filename)
+    assert os.path.exists(".gitignore")
+
+    os.unlink("requirements.txt")
+    UpdateCommand.handle(config_filename)
+    assert "requests==1.0" in tmpwd.join("requirements.txt").read()
+
+
+PYTHON_PROJECTFILE = PROJECTFILE + """
+with require("python") as python:
+    python.setup(name="foo")
+    python.add_requirements("requests")
+"""
+
+
+@pytest.fixture()
+def resolutions(monkeypatch):
+    """
+    Records the options of each requirements resolution, instead of actually resolving them.
+
+    """
+    calls = []
+
+    def resolve(requirements, *, cache_dir, seed=None, max_rounds=10, **options):
+        calls.append(options)
+        return {line.split()[0]: line.split()[0] + "==1.0" for line in requirements if not line.startswith("-")}, {}
+
+    monkeypatch.setattr(
+        "medikit.feature.python.RequirementsResolver",
+        functools.partial(RequirementsResolver, cache_dir="/tmp", resolve=resolve),
+    )
+    return calls
+
+
+def test_update_upgrade_bypasses_fingerprint_and_lock(tmpwd, resolutions):
+    tmpwd.join("Projectfile").write(PYTHON_PROJECTFILE)
+    config_filename = str(tmpwd.join("Projectfile"))
+
+    UpdateCommand.handle(config_filename)
+    assert [options["refresh_before"] for options in resolutions] == [None, None]
+    assert "requests==1.0" in tmpwd.join("requirements.txt").read()
+
+    os.utime(FINGERPRINT_FILE, (0, 0))
+    UpdateCommand.handle(config_filename)
+    assert os.stat(FINGERPRINT_FILE).st_mtime == 0
+    UpdateCommand.handle(config_filename, override_requirements=True)
+    assert os.stat(FINGERPRINT_FILE).st_mtime != 0, "overriding requirements should bypass the fingerprint"
+    assert len(resolutions) == 2, "locked resolutions should be used"
+
+    os.utime(FINGERPRINT_FILE, (0, 0))
+    UpdateCommand.handle(config_filename, upgrade=True)
+    assert os.stat(FINGERPRINT_FILE).st_mtime != 0, "upgrading should bypass the fingerprint"
+    assert len(resolutions) == 4, "upgrading should ignore the lock"
+    assert all(options["refresh_before"] is not None for options in resolutions[2:])
+
+
+def test_update_offline(tmpwd, resolutions, monkeypatch):
+    tmpwd.join("Projectfile").write(PYTHON_PROJECTFILE)
+    config_filename = str(tmpwd.join("Projectfile"))
+
+    def connect(*args, **kwargs):
+        raise AssertionError("No network access expected when offline.")
+
+    monkeypatch.setattr(socket.socket, "connect", connect)
+
+    UpdateCommand.handle(config_filename, offline=True)
+    assert [options["offline"] for options in resolutions] == [True, True]
+    assert all(options["wheelhouses"] for options in resolutions)
+
+    # locked resolutions are used as is, without resolving anything
+    UpdateCommand.handle(config_filename, offline=True, override_requirements=True)
+    assert len(resolutions) == 2